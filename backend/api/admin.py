@@ -10,6 +10,8 @@ from config.database import (
     UserBalance,
     Portfolio,
 )
+from services.data_service import DataService
+from services.ml_service import MLService
 
 
 admin_bp = Blueprint('admin', __name__, url_prefix="/admin")
@@ -107,6 +109,24 @@ def admin_stats():
         return jsonify({'error': 'Failed to fetch admin stats'}), 500
 
 
+@admin_bp.route('/cache-stats', methods=['GET'])
+@jwt_required()
+def cache_stats():
+    """Get in-process cache counters"""
+    admin_user = _ensure_admin()
+    if not admin_user:
+        return jsonify({'error': 'Admin access required'}), 403
+
+    return jsonify({
+        'quotes': DataService.quote_cache_stats(),
+        'stock_info': DataService.stock_info_cache_stats(),
+        'intraday': DataService.intraday_cache_stats(),
+        'models': MLService.model_cache_stats(),
+        'features': MLService.feature_store_stats(),
+        'symbol_index': DataService.search_index_stats(),
+    }), 200
+
+
 @admin_bp.route('/users', methods=['GET'])
 @jwt_required()
 def list_users():
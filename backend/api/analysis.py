@@ -1,12 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import yfinance as yf
 import pandas as pd
 from utils.indicators import calculate_all_indicators, get_trading_signals
 from utils.risk_analysis import calculate_all_risk_metrics, get_risk_assessment
 from utils.sentiment_analysis import get_stock_news_sentiment, get_sentiment_signal
 from utils.regime_detection import detect_regime, risk_summary
 from services.data_service import DataService
+from utils.serialization import frame_records, series_records
 
 
 analysis_bp = Blueprint('analysis', __name__)
@@ -51,10 +51,9 @@ def get_technical_indicators(symbol):
         period = request.args.get('period', '6mo')
         
         # Fetch stock data
-        stock = yf.Ticker(symbol)
-        df = stock.history(period=period)
+        df = DataService.get_price_frame(symbol, period=period)
         
-        if df.empty:
+        if df is None or df.empty:
             return jsonify({'error': 'No data available'}), 404
         
         # Calculate indicators
@@ -67,21 +66,13 @@ def get_technical_indicators(symbol):
                 latest_indicators[key] = float(series.iloc[-1]) if pd.notna(series.iloc[-1]) else None
         
         # Get trading signals
-        signals = get_trading_signals(df)
+        signals = get_trading_signals(df, indicators)
         
         # Prepare chart data (last 60 days)
-        chart_data = []
-        for i in range(max(0, len(df) - 60), len(df)):
-            row = {
-                'date': df.index[i].strftime('%Y-%m-%d'),
-                'close': float(df['Close'].iloc[i]),
-            }
-            # Add indicator values for charts
-            for key in ['SMA_20', 'SMA_50', 'BB_upper', 'BB_middle', 'BB_lower', 'RSI', 'MACD']:
-                if key in indicators and i < len(indicators[key]):
-                    val = indicators[key].iloc[i]
-                    row[key] = float(val) if pd.notna(val) else None
-            chart_data.append(row)
+        chart_keys = ['SMA_20', 'SMA_50', 'BB_upper', 'BB_middle', 'BB_lower', 'RSI', 'MACD']
+        chart_frame = pd.DataFrame({'close': df['Close'], **{k: indicators[k] for k in chart_keys}}).iloc[-60:]
+        chart_fields = {'close': 'close', **{k: k for k in chart_keys}}
+        chart_data = frame_records(chart_frame, chart_fields, nullable=True)
         
         return jsonify({
             'symbol': symbol,
@@ -103,20 +94,18 @@ def get_risk_analysis(symbol):
         period = request.args.get('period', '1y')
         
         # Fetch stock data
-        stock = yf.Ticker(symbol)
-        df = stock.history(period=period)
+        df = DataService.get_price_frame(symbol, period=period)
         
-        if df.empty:
+        if df is None or df.empty:
             return jsonify({'error': 'No data available'}), 404
         
         # Fetch market data (S&P 500 as benchmark)
-        market = yf.Ticker('^GSPC')
-        market_df = market.history(period=period)
+        market_df = DataService.get_price_frame('^GSPC', period=period)
         
         # Calculate risk metrics
         metrics = calculate_all_risk_metrics(
             df['Close'],
-            market_df['Close'] if not market_df.empty else None
+            market_df['Close'] if market_df is not None and not market_df.empty else None
         )
         
         # Get risk assessment
@@ -126,33 +115,22 @@ def get_risk_analysis(symbol):
         returns = df['Close'].pct_change().dropna()
         rolling_vol = returns.rolling(window=30).std() * (252 ** 0.5)
         
-        volatility_chart = []
-        for i in range(len(rolling_vol)):
-            if pd.notna(rolling_vol.iloc[i]):
-                volatility_chart.append({
-                    'date': rolling_vol.index[i].strftime('%Y-%m-%d'),
-                    'volatility': float(rolling_vol.iloc[i])
-                })
+        volatility_chart = series_records(rolling_vol.dropna().iloc[-90:], 'volatility')  # Last 90 days
         
         # Calculate drawdown chart
         cumulative = (1 + returns).cumprod()
         running_max = cumulative.cummax()
         drawdown = (cumulative - running_max) / running_max
         
-        drawdown_chart = []
-        for i in range(len(drawdown)):
-            drawdown_chart.append({
-                'date': drawdown.index[i].strftime('%Y-%m-%d'),
-                'drawdown': float(drawdown.iloc[i])
-            })
+        drawdown_chart = series_records(drawdown.iloc[-90:], 'drawdown')
         
         return jsonify({
             'symbol': symbol,
             'metrics': metrics,
             'assessment': assessment,
             'charts': {
-                'volatility': volatility_chart[-90:],  # Last 90 days
-                'drawdown': drawdown_chart[-90:]
+                'volatility': volatility_chart,
+                'drawdown': drawdown_chart
             }
         }), 200
         
@@ -168,9 +146,8 @@ def get_sentiment_analysis(symbol):
         symbol = symbol.upper()
         
         # Get stock info for company name
-        stock = yf.Ticker(symbol)
-        info = stock.info
-        company_name = info.get('longName', symbol)
+        info = DataService.fetch_stock_info(symbol) or {}
+        company_name = info.get('name', symbol)
         
         # Get sentiment from news
         sentiment = get_stock_news_sentiment(symbol, company_name)
@@ -205,11 +182,10 @@ def get_comprehensive_analysis(symbol):
         symbol = symbol.upper()
         
         # Get stock data
-        stock = yf.Ticker(symbol)
-        df = stock.history(period='6mo')
-        info = stock.info
+        df = DataService.get_price_frame(symbol, period='6mo')
+        info = DataService.fetch_stock_info(symbol) or {}
         
-        if df.empty:
+        if df is None or df.empty:
             return jsonify({'error': 'No data available'}), 404
         
         # Technical Analysis
@@ -220,7 +196,7 @@ def get_comprehensive_analysis(symbol):
         assessment = get_risk_assessment(metrics)
         
         # Sentiment Analysis
-        company_name = info.get('longName', symbol)
+        company_name = info.get('name', symbol)
         sentiment = get_stock_news_sentiment(symbol, company_name)
         sentiment_signal = get_sentiment_signal(sentiment) if sentiment else 'NEUTRAL'
         
@@ -297,10 +273,9 @@ def compare_stocks():
         
         for symbol in symbols[:5]:  # Limit to 5 stocks
             symbol = symbol.upper()
-            stock = yf.Ticker(symbol)
-            df = stock.history(period='3mo')
+            df = DataService.get_price_frame(symbol, period='3mo')
             
-            if df.empty:
+            if df is None or df.empty:
                 continue
             
             # Calculate metrics
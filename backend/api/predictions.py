@@ -1,10 +1,8 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 from config.database import db, PredictionHistory
-from services.data_service import DataService
 from services.ml_service import MLService
 
 predictions_bp = Blueprint('predictions', __name__)
@@ -19,15 +17,10 @@ def predict_stock(symbol):
         symbol = symbol.upper()
 
         # Get historical data (6 months for better context)
-        hist_data = DataService.fetch_historical_data(symbol, period='6mo')
-        if not hist_data:
+        df = MLService.load_history(symbol, period='6mo')
+        if df is None:
             return jsonify({'error': 'No historical data available'}), 404
 
-        # Build DataFrame
-        df = pd.DataFrame(hist_data)
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
-
         close_prices = df['close'].values.astype(float)
         last_price = float(close_prices[-1])
 
@@ -1,13 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-import yfinance as yf
 from datetime import datetime, timedelta
 import pandas as pd
 from config.database import db, Stock, Watchlist
 from services.data_service import DataService
+from services.market_data import INTRADAY_INTERVALS, get_provider
+from utils.serialization import (
+    json_response, ohlcv_records, ohlcv_columns, ohlcv_npz, ohlcv_arrow, arrow_available,
+)
 
 stocks_bp = Blueprint('stocks', __name__)
 
+HISTORICAL_FORMATS = ('records', 'columnar', 'npz', 'arrow')
+
 
 @stocks_bp.route('/search', methods=['GET'])
 @jwt_required()
@@ -19,8 +24,8 @@ def search_stocks():
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
         
-        # Use DataService search (same popular list idea)
-        results = DataService.search_stocks(query)
+        limit = min(request.args.get('limit', 10, type=int), 50)
+        results = DataService.search_stocks(query, limit=limit)
         
         return jsonify({'results': results}), 200
         
@@ -68,37 +73,63 @@ def get_stock_info(symbol):
 @stocks_bp.route('/historical/<symbol>', methods=['GET'])
 @jwt_required()
 def get_historical_data(symbol):
-    """Get historical stock data"""
+    """
+    Get historical stock data.
+
+    Query params:
+        format: records (default), columnar, npz or arrow
+        since:  epoch milliseconds; bars at or after this timestamp are
+                returned (not only strictly newer ones). Polling clients pass
+                back last_timestamp, so the last bar they hold is re-sent:
+                the newest intraday bar may still be forming, and the client
+                should replace its bar with the same timestamp rather than
+                append it.
+    """
     try:
         symbol = symbol.upper()
         period = request.args.get('period', '1y')
         interval = request.args.get('interval', '1d')
-        
-        # Use yfinance directly here to preserve interval behavior
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period=period, interval=interval)
-        
-        if hist.empty:
+        fmt = request.args.get('format', 'records')
+        since = request.args.get('since', type=int)
+        
+        if fmt not in HISTORICAL_FORMATS:
+            return jsonify({'error': f"format must be one of {', '.join(HISTORICAL_FORMATS)}"}), 400
+        if fmt == 'arrow' and not arrow_available():
+            return jsonify({'error': 'Arrow format requires pyarrow on the server'}), 400
+        
+        if interval == '1d':
+            # Daily bars come from the local price store
+            hist = DataService.get_price_frame(symbol, period=period)
+        elif interval in INTRADAY_INTERVALS:
+            # Intraday bars are derived from the cached minute data
+            hist = DataService.get_intraday_frame(symbol, interval, period=period)
+        else:
+            hist = get_provider().history(symbol, period=period, interval=interval)
+        
+        if hist is None or hist.empty:
             return jsonify({'error': 'No data available'}), 404
         
-        data = []
-        for index, row in hist.iterrows():
-            data.append({
-                'date': index.strftime('%Y-%m-%d'),
-                'timestamp': int(index.timestamp() * 1000),
-                'open': float(row['Open']),
-                'high': float(row['High']),
-                'low': float(row['Low']),
-                'close': float(row['Close']),
-                'volume': int(row['Volume'])
-            })
+        last_timestamp = int(hist.index[-1:].as_unit('ms').asi8[0])
+        if since is not None:
+            hist = hist[hist.index.as_unit('ms').asi8 >= since]
         
-        return jsonify({
+        if fmt in ('npz', 'arrow'):
+            body = ohlcv_npz(hist) if fmt == 'npz' else ohlcv_arrow(hist)
+            mimetype = 'application/octet-stream' if fmt == 'npz' else 'application/vnd.apache.arrow.stream'
+            response = current_app.response_class(body, mimetype=mimetype)
+            response.headers['X-Last-Timestamp'] = str(last_timestamp)
+            return response
+        
+        payload = {
             'symbol': symbol,
             'period': period,
             'interval': interval,
-            'data': data
-        }), 200
+            'data': ohlcv_columns(hist) if fmt == 'columnar' else ohlcv_records(hist, timestamp=True)
+        }
+        if fmt == 'columnar' or since is not None:
+            payload['format'] = fmt
+            payload['last_timestamp'] = last_timestamp
+        return json_response(payload)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -110,17 +141,15 @@ def get_realtime_price(symbol):
     """Get real-time stock price"""
     try:
         symbol = symbol.upper()
-        stock = yf.Ticker(symbol)
-        
-        hist = stock.history(period='1d', interval='1m')
+        hist = DataService.get_intraday_frame(symbol, '1m', period='1d')
         
-        if hist.empty:
+        if hist is None or hist.empty:
             return jsonify({'error': 'No real-time data available'}), 404
         
         latest = hist.iloc[-1]
         
-        info = stock.info
-        previous_close = info.get('previousClose', latest['Close'])
+        info = DataService.fetch_stock_info(symbol) or {}
+        previous_close = info.get('previous_close') or latest['Close']
         change = latest['Close'] - previous_close
         change_percent = (change / previous_close) * 100 if previous_close > 0 else 0
         
@@ -145,10 +174,12 @@ def get_watchlist():
         user_id = get_jwt_identity()
         watchlist = Watchlist.query.filter_by(user_id=user_id).all()
         
+        infos = DataService.fetch_stock_infos([item.symbol for item in watchlist])
+        
         stocks = []
         for item in watchlist:
             try:
-                info = DataService.fetch_stock_info(item.symbol)
+                info = infos.get(item.symbol.upper())
                 if not info:
                     continue
                 stocks.append({
@@ -231,10 +262,12 @@ def get_trending_stocks():
     try:
         trending_symbols = ['AAPL', 'GOOGL', 'MSFT', 'AMZN', 'TSLA', 'META', 'NVDA', 'JPM']
         
+        infos = DataService.fetch_stock_infos(trending_symbols)
+        
         trending = []
         for symbol in trending_symbols:
             try:
-                info = DataService.fetch_stock_info(symbol)
+                info = infos.get(symbol)
                 if not info:
                     continue
                 trending.append({
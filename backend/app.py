@@ -14,6 +14,7 @@ from api.predictions import predictions_bp
 from api.trading import trading_bp
 from api.analysis import analysis_bp
 from api.admin import admin_bp  # NEW
+from services.symbol_index import symbol_index
 import os
 from werkzeug.security import generate_password_hash
 
@@ -47,6 +48,9 @@ def create_app(config_name='development'):
     # Initialize database
     init_db(app)
 
+    # Build the symbol search index up front so the first search is fast
+    symbol_index.load()
+
     # Register blueprints
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(stocks_bp, url_prefix='/api/stocks')
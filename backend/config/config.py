@@ -17,11 +17,36 @@ class Config:
     # Stock Data Settings
     DEFAULT_STOCK_PERIOD = '2y'  # 2 years of historical data
     PREDICTION_DAYS = 30  # Predict next 30 days
+    FORECAST_HORIZON = PREDICTION_DAYS  # days ahead covered by direct multi-horizon models
     
     # ML Model Settings
     LSTM_EPOCHS = 50
     LSTM_BATCH_SIZE = 32
     SEQUENCE_LENGTH = 60  # Use 60 days to predict next day
+    ENSEMBLE_TRAIN_PERIOD = DEFAULT_STOCK_PERIOD  # history used for the nightly ensemble fit
+    ENSEMBLE_TRAIN_CORES = int(os.getenv('ENSEMBLE_TRAIN_CORES', os.cpu_count() or 1))  # 1 = sequential
+    # Nightly incremental ensemble updates: new bars warm-start the members
+    # on the last INCREMENTAL_WINDOW bars; drift or too many updates since
+    # the last full fit trigger a full retrain instead
+    INCREMENTAL_UPDATES = os.getenv('INCREMENTAL_UPDATES', 'true').lower() == 'true'
+    INCREMENTAL_WINDOW = 120  # bars the warm-started stages/trees are fitted on
+    INCREMENTAL_BOOST_ROUNDS = 10  # boosting stages added per update
+    INCREMENTAL_TREE_FRACTION = 0.1  # share of forest trees regrown per update
+    INCREMENTAL_DRIFT_THRESHOLD = 2.0  # RMS z-score of returns since the last full fit
+    INCREMENTAL_MAX_UPDATES = 10  # full retrain after this many updates
+    # Cross-sectional panel model: one forest over every stored symbol, used
+    # for any symbol without an ensemble instead of a per-symbol RandomForest
+    PANEL_MODEL_ENABLED = os.getenv('PANEL_MODEL_ENABLED', 'true').lower() == 'true'
+    PANEL_TRAIN_PERIOD = '5y'
+    PANEL_MIN_BARS = 100  # symbols with less history are left out of training
+    PANEL_MAX_SAMPLES = 200_000  # bootstrap rows per tree, caps fit cost
+    PANEL_RESIDUAL_SHRINKAGE = 50  # rows of evidence a per-symbol adjustment must outweigh
+    # Hyperparameters written by `python -m ml_models.tuning --apply`
+    TUNED_PARAMS_PATH = os.getenv('TUNED_PARAMS_PATH', 'data/tuned_params.json')
+    PREDICTION_SYMBOL_TIMEOUT = 120  # soft time limit of each nightly predict_symbol subtask, in seconds
+    MODEL_CACHE_MAX_MB = int(os.getenv('MODEL_CACHE_MAX_MB', 512))  # loaded-model LRU budget
+    MODEL_CACHE_MAX_ENTRIES = int(os.getenv('MODEL_CACHE_MAX_ENTRIES', 512))  # each mapped model holds one fd
+    MODEL_CACHE_STAT_SECONDS = 5  # how often cached models re-check their files
     
     # Paper Trading Settings
     INITIAL_VIRTUAL_BALANCE = 100000  # $100,000 virtual money
@@ -35,7 +60,39 @@ class Config:
     
     # Cache Settings
     CACHE_STOCK_DATA_HOURS = 1
-    
+    QUOTE_CACHE_TTL_SECONDS = int(os.getenv('QUOTE_CACHE_TTL_SECONDS', 60))
+    QUOTE_CACHE_MAX_ENTRIES = 5000
+    STOCK_INFO_REFRESH_WORKERS = 4  # background stale-while-revalidate refreshes
+
+    # Market data provider: 'yfinance' or 'fixture' (offline, deterministic)
+    MARKET_DATA_PROVIDER = os.getenv('MARKET_DATA_PROVIDER', 'yfinance')
+    MARKET_DATA_FIXTURE_DIR = os.getenv('MARKET_DATA_FIXTURE_DIR', 'data/fixtures')
+    MARKET_DATA_FIXTURE_LATENCY_MS = float(os.getenv('MARKET_DATA_FIXTURE_LATENCY_MS', 0))
+
+    # Local columnar price store (one memory-mapped file per symbol)
+    PRICE_STORE_DIR = os.getenv('PRICE_STORE_DIR', 'data/price_store')
+    SESSION_CLOSE_UTC_HOUR = 21  # US market close (16:00 ET) with DST margin
+    PRICE_ADJUSTMENT_RTOL = 1e-4  # re-fetched close differing by more: history was re-adjusted
+    PRICE_UPSERT_BATCH_SIZE = 5000  # rows per set-based upsert statement
+    PRICE_GAP_LOOKBACK_DAYS = 365  # window scanned for missing sessions on refresh
+    PRICE_GAP_MIN_SESSIONS = 2  # single missing weekdays are usually holidays
+    PRICE_FETCH_BATCH_SIZE = int(os.getenv('PRICE_FETCH_BATCH_SIZE', 50))  # symbols per download
+    PRICE_FETCH_WORKERS = int(os.getenv('PRICE_FETCH_WORKERS', 4))  # concurrent batch downloads
+
+    # Per-symbol float32 model features, recomputed when a new bar arrives
+    FEATURE_STORE_DIR = os.getenv('FEATURE_STORE_DIR', 'data/feature_store')
+
+    # Intraday bar cache: (base interval, sessions kept), finest first. Requests
+    # are served from the first tier whose base divides the interval and
+    # whose retention covers the period; anything else goes upstream.
+    INTRADAY_TIERS = (('1m', 7), ('5m', 60))
+    INTRADAY_REFRESH_SECONDS = int(os.getenv('INTRADAY_REFRESH_SECONDS', 60))
+    INTRADAY_CACHE_MAX_ENTRIES = 500
+
+    # Symbol search listing (CSV symbol,name or NASDAQ Trader pipe format)
+    SYMBOL_LISTING_PATH = os.getenv('SYMBOL_LISTING_PATH', 'data/listings.csv')
+    SYMBOL_LISTING_CHECK_SECONDS = 5  # how often to stat the file for changes
+
     # Risk Analysis Settings
     RISK_FREE_RATE = 0.02  # 2% annual risk-free rate
 
@@ -1,18 +1,54 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 from datetime import datetime, date
 
 
 db = SQLAlchemy()
 
 
+PRICE_UNIQUE_INDEX = 'uq_stock_prices_stock_id_date'
+
+
 def init_db(app):
     """Initialize database with Flask app"""
     db.init_app(app)
     with app.app_context():
         db.create_all()
+        ensure_columns(Stock)
+        ensure_price_unique_index()
         print("✅ Database initialized successfully!")
 
 
+def ensure_columns(model):
+    """Add nullable columns that were added to a model after its table was created"""
+    table = model.__table__
+    existing = {c['name'] for c in inspect(db.engine).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=db.engine.dialect)
+        db.session.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+    db.session.commit()
+
+
+def ensure_price_unique_index():
+    """Add the (stock_id, date) unique index to databases created before it existed"""
+    existing = {ix['name'] for ix in inspect(db.engine).get_indexes('stock_prices')}
+    if PRICE_UNIQUE_INDEX in existing:
+        return
+
+    # Drop duplicate bars left by the old row-by-row ingest, keeping the first
+    db.session.execute(text(
+        'DELETE FROM stock_prices WHERE id NOT IN '
+        '(SELECT MIN(id) FROM stock_prices GROUP BY stock_id, date)'
+    ))
+    db.session.commit()
+
+    for index in StockPrice.__table__.indexes:
+        if index.name == PRICE_UNIQUE_INDEX:
+            index.create(db.engine, checkfirst=True)
+
+
 # User Model
 class User(db.Model):
     __tablename__ = 'users'
@@ -83,6 +119,40 @@ class Stock(db.Model):
     market_cap = db.Column(db.Float)
     last_updated = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Cached metadata/quote fields (refreshed by DataService.fetch_stock_info)
+    description = db.Column(db.Text)
+    pe_ratio = db.Column(db.Float)
+    current_price = db.Column(db.Float)
+    previous_close = db.Column(db.Float)
+    open_price = db.Column(db.Float)
+    day_high = db.Column(db.Float)
+    day_low = db.Column(db.Float)
+    volume = db.Column(db.BigInteger)
+    fifty_two_week_high = db.Column(db.Float)
+    fifty_two_week_low = db.Column(db.Float)
+    beta = db.Column(db.Float)
+
+    def to_info(self):
+        """Same shape as DataService.fetch_stock_info"""
+        return {
+            'symbol': self.symbol,
+            'name': self.company_name or self.symbol,
+            'sector': self.sector or 'N/A',
+            'industry': self.industry or 'N/A',
+            'description': self.description or '',
+            'market_cap': self.market_cap or 0,
+            'pe_ratio': self.pe_ratio,
+            'current_price': self.current_price,
+            'previous_close': self.previous_close,
+            'open': self.open_price,
+            'day_high': self.day_high,
+            'day_low': self.day_low,
+            'volume': self.volume,
+            '52_week_high': self.fifty_two_week_high,
+            '52_week_low': self.fifty_two_week_low,
+            'beta': self.beta,
+        }
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -223,6 +293,9 @@ class UserBalance(db.Model):
 # Stock Price History Model
 class StockPrice(db.Model):
     __tablename__ = 'stock_prices'
+    __table_args__ = (
+        db.Index(PRICE_UNIQUE_INDEX, 'stock_id', 'date', unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     stock_id = db.Column(db.Integer, db.ForeignKey('stocks.id'), nullable=False)
@@ -247,3 +320,18 @@ class StockPrice(db.Model):
             'close': self.close,
             'volume': self.volume,
         }
+
+
+# Backfill ranges upstream has already answered for a symbol. A gap inside
+# one (a holiday, a trading halt) is not requested again on later refreshes.
+class CheckedPriceRange(db.Model):
+    __tablename__ = 'checked_price_ranges'
+    __table_args__ = (
+        db.Index('uq_checked_price_ranges', 'stock_id', 'start_date', 'end_date', unique=True),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    stock_id = db.Column(db.Integer, db.ForeignKey('stocks.id'), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    checked_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,277 @@
+"""
+Walk-forward backtesting for the price models
+
+For every forecast origin t (every `step` bars after `min_train`), a model is
+fitted on the bars before t (all of them, or the last `window` for rolling
+windows) and asked for the next `horizon` closes, which are compared with
+what actually happened. Folds run in parallel on a process pool, with each
+fold's models limited to one thread so workers x cores threads do not
+oversubscribe the CPU; errors are
+computed over the stacked (folds x horizon) arrays and reported together
+with fit and inference latency, as JSON (full detail) and CSV (one row per
+symbol/model) so reports can be diffed between releases.
+
+Usage:
+    python -m ml_models.backtest AAPL MSFT --models lstm,rf --horizon 5
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from .ensemble import EnsembleModel
+from .lstm_model import LSTMModel
+from .prophet_model import ProphetModel
+from .transformer_model import TransformerModel
+from .xgboost_model import XGBoostModel
+
+
+class _Adapter:
+    """
+    fit(frame) then forecast(frame, horizon) -> closes; frame has lowercase
+    OHLCV columns. n_jobs, when set, caps the threads the model fits with.
+    """
+
+    n_jobs = None
+
+    def fit(self, frame):
+        pass
+
+    def forecast(self, frame, horizon):
+        raise NotImplementedError
+
+
+class _PriceModelAdapter(_Adapter):
+    """LSTMModel / TransformerModel / EnsembleModel: train(prices) + predict(prices, days)"""
+
+    def __init__(self, factory, params=None):
+        self.model = factory(**(params or {}))
+
+    def fit(self, frame):
+        prices = frame['close'].values.astype(float)
+        if isinstance(self.model, EnsembleModel):
+            self.model.train(prices, n_jobs=self.n_jobs)
+            return
+        if self.n_jobs is not None and 'n_jobs' in self.model.model.get_params():
+            self.model.model.set_params(n_jobs=self.n_jobs)
+        self.model.train(prices)
+
+    def forecast(self, frame, horizon):
+        return self.model.predict(frame['close'].values.astype(float), horizon)
+
+
+class _StaticAdapter(_Adapter):
+    """XGBoostModel / ProphetModel: stateless predict(df, days); XGBoost fits inside it"""
+
+    def __init__(self, cls, params=None):
+        self.cls = cls
+        self.params = params
+
+    def forecast(self, frame, horizon):
+        params = self.params
+        if self.n_jobs is not None and self.cls is XGBoostModel:
+            from services.ml_service import MLService
+            params = {**(params if params is not None else MLService.tuned_params('xgboost')), 'n_jobs': self.n_jobs}
+        if params:
+            return self.cls.predict(frame, horizon, params)
+        return self.cls.predict(frame, horizon)
+
+
+class _RandomForestAdapter(_Adapter):
+    """MLService's multi-horizon RandomForest, fitted in memory"""
+
+    def __init__(self, horizon, params=None):
+        self.horizon = horizon
+        self.params = params
+
+    def fit(self, frame):
+        from services.ml_service import MLService
+        params = self.params
+        if self.n_jobs is not None:
+            params = {**(params if params is not None else MLService.tuned_params('rf')), 'n_jobs': self.n_jobs}
+        fitted = MLService.fit_model(frame, horizons=self.horizon, params=params)
+        if fitted is None:
+            raise ValueError('not enough data')
+        self.model, self.scaler = fitted[0], fitted[1]
+
+    def forecast(self, frame, horizon):
+        from services.ml_service import MLService
+        return MLService.forecast_path(self.model, self.scaler, frame, horizon)
+
+
+# name -> factory(horizon, params); params override the model's hyperparameters
+MODELS = {
+    'lstm': lambda horizon, params=None: _PriceModelAdapter(LSTMModel, params),
+    'transformer': lambda horizon, params=None: _PriceModelAdapter(TransformerModel, params),
+    'ensemble': lambda horizon, params=None: _PriceModelAdapter(lambda **kw: EnsembleModel(kw or None), params),
+    'xgboost': lambda horizon, params=None: _StaticAdapter(XGBoostModel, params),
+    'prophet': lambda horizon, params=None: _StaticAdapter(ProphetModel),
+    'rf': _RandomForestAdapter,
+}
+
+
+def fold_origins(n, min_train, step, horizon):
+    """Forecast origins (index of the first test bar) for a series of n bars"""
+    return list(range(min_train, n - horizon + 1, step))
+
+
+def _run_fold(model_name, train, horizon, params=None, n_jobs=1):
+    """
+    Fit on `train`, forecast `horizon` closes; returns (forecast or None,
+    fit_s, predict_s, error). n_jobs=1 by default: folds run one per pool
+    worker, so the pool already uses every core.
+    """
+    try:
+        adapter = MODELS[model_name](horizon, params)
+        adapter.n_jobs = n_jobs
+        start = time.perf_counter()
+        adapter.fit(train)
+        fit_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        forecast = adapter.forecast(train, horizon)
+        predict_s = time.perf_counter() - start
+    except Exception as e:
+        return None, 0.0, 0.0, str(e)[:200]
+
+    if forecast is None or len(forecast) != horizon:
+        return None, fit_s, predict_s, 'no forecast'
+    return np.asarray(forecast, dtype=np.float64), fit_s, predict_s, None
+
+
+def summarize(forecasts, actuals, last_closes):
+    """Error metrics over stacked (folds, horizon) arrays"""
+    errors = forecasts - actuals
+    predicted_move = np.sign(forecasts[:, -1] - last_closes)
+    actual_move = np.sign(actuals[:, -1] - last_closes)
+    return {
+        'mae': float(np.mean(np.abs(errors))),
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'mape': float(np.mean(np.abs(errors) / np.abs(actuals)) * 100),
+        'direction_accuracy': float(np.mean(predicted_move == actual_move)),
+        'mae_by_horizon': np.mean(np.abs(errors), axis=0).round(6).tolist(),
+    }
+
+
+def run_backtest(frames, models, horizon=5, step=21, min_train=252, window=None, workers=None):
+    """
+    Walk-forward backtest.
+
+    frames:  {symbol: DataFrame with lowercase OHLCV columns}
+    window:  None for expanding windows, or the number of bars in a rolling window
+    Returns a report dict with one result per (symbol, model).
+    """
+    tasks = []
+    for symbol, frame in frames.items():
+        closes = frame['close'].values.astype(float)
+        for origin in fold_origins(len(frame), min_train, step, horizon):
+            first = 0 if window is None else max(0, origin - window)
+            for model_name in models:
+                tasks.append((symbol, model_name, origin, frame.iloc[first:origin], closes[origin:origin + horizon]))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_fold, model_name, train, horizon)
+                   for _, model_name, _, train, _ in tasks]
+        outcomes = [future.result() for future in futures]
+
+    results = []
+    for symbol in frames:
+        for model_name in models:
+            rows = [(task, outcome) for task, outcome in zip(tasks, outcomes)
+                    if task[0] == symbol and task[1] == model_name]
+            ok = [(task, outcome) for task, outcome in rows if outcome[0] is not None]
+
+            result = {
+                'symbol': symbol,
+                'model': model_name,
+                'folds': len(rows),
+                'failed_folds': len(rows) - len(ok),
+                'errors': sorted({outcome[3] for _, outcome in rows if outcome[3]}),
+            }
+            if ok:
+                forecasts = np.vstack([outcome[0] for _, outcome in ok])
+                actuals = np.vstack([task[4] for task, _ in ok])
+                last_closes = np.array([task[3]['close'].iloc[-1] for task, _ in ok], dtype=np.float64)
+                result.update(summarize(forecasts, actuals, last_closes))
+                result['fit_ms'] = float(np.mean([outcome[1] for _, outcome in ok]) * 1000)
+                result['predict_ms'] = float(np.mean([outcome[2] for _, outcome in ok]) * 1000)
+                result['fold_origins'] = [str(frames[symbol].index[task[2]].date()) for task, _ in ok]
+            results.append(result)
+
+    return {
+        'generated_at': datetime.utcnow().isoformat(),
+        'config': {
+            'symbols': list(frames),
+            'models': list(models),
+            'horizon': horizon,
+            'step': step,
+            'min_train': min_train,
+            'window': window if window is not None else 'expanding',
+        },
+        'results': results,
+    }
+
+
+CSV_FIELDS = ['symbol', 'model', 'folds', 'failed_folds', 'mae', 'rmse', 'mape',
+              'direction_accuracy', 'fit_ms', 'predict_ms']
+
+
+def write_report(report, path):
+    """Write `<path>.json` (full report) and `<path>.csv` (summary rows)"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f'{path}.json', 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    with open(f'{path}.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for result in report['results']:
+            writer.writerow(result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Walk-forward backtest of the price models')
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--models', default=','.join(MODELS), help=f"comma-separated: {', '.join(MODELS)}")
+    parser.add_argument('--period', default='5y', help='history loaded per symbol')
+    parser.add_argument('--horizon', type=int, default=5)
+    parser.add_argument('--step', type=int, default=21, help='bars between forecast origins')
+    parser.add_argument('--min-train', type=int, default=252)
+    parser.add_argument('--window', type=int, default=None, help='rolling window in bars (default: expanding)')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--out', default=os.path.join('reports', f"backtest_{datetime.utcnow():%Y%m%d_%H%M%S}"))
+    args = parser.parse_args(argv)
+
+    models = [m.strip() for m in args.models.split(',') if m.strip()]
+    unknown = set(models) - set(MODELS)
+    if unknown:
+        parser.error(f"unknown models: {', '.join(sorted(unknown))}")
+
+    from services.ml_service import MLService
+    frames = {}
+    for symbol in args.symbols:
+        frame = MLService.load_history(symbol.upper(), period=args.period)
+        if frame is None:
+            print(f"❌ No history for {symbol}")
+            continue
+        frames[symbol.upper()] = frame
+
+    report = run_backtest(frames, models, args.horizon, args.step, args.min_train, args.window, args.workers)
+    write_report(report, args.out)
+
+    for result in report['results']:
+        if 'mae' in result:
+            print(f"{result['symbol']:<6} {result['model']:<12} MAE {result['mae']:.4f}  MAPE {result['mape']:.2f}%  "
+                  f"dir {result['direction_accuracy']:.2f}  fit {result['fit_ms']:.0f}ms  "
+                  f"predict {result['predict_ms']:.1f}ms  ({result['folds']} folds)")
+        else:
+            print(f"{result['symbol']:<6} {result['model']:<12} all {result['folds']} folds failed")
+    print(f"✅ Report written to {args.out}.json / .csv")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,91 @@
 """
 Ensemble Model - Combines multiple models for better predictions
 """
+from datetime import datetime
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 import numpy as np
+from .flat_trees import flatten
+from .incremental import add_boosting_rounds, drift, replace_trees, return_stats
 from .lstm_model import LSTMModel
 from .transformer_model import TransformerModel
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import Ridge
 import joblib
 
+
+MEMBER_ATTRS = {
+    'lstm': 'lstm',
+    'transformer': 'transformer',
+    'random_forest': 'rf',
+    'gradient_boosting': 'gb',
+    'ridge': 'ridge'
+}
+MEMBER_LABELS = {
+    'lstm': 'LSTM',
+    'transformer': 'Transformer',
+    'random_forest': 'Random Forest',
+    'gradient_boosting': 'Gradient Boosting',
+    'ridge': 'Ridge'
+}
+
+
+def _estimator(member):
+    """The sklearn estimator behind a member (the wrappers keep theirs in .model)"""
+    return getattr(member, 'model', member)
+
+
+def _fit_member(name, member, prices, n_jobs=None):
+    """
+    Fit one ensemble member; returns (member, score, seconds), with member
+    None on failure. Module-level so it can run in a worker process.
+    """
+    start = time.perf_counter()
+    estimator = _estimator(member)
+    params = estimator.get_params()
+    budgeted = n_jobs is not None and 'n_jobs' in params
+    try:
+        if budgeted:
+            estimator.set_params(n_jobs=n_jobs)
+        
+        if name in ('lstm', 'transformer'):
+            score = member.train(prices)
+        else:
+            # Simple models use the bar index as their only feature
+            X = np.arange(len(prices)).reshape(-1, 1)
+            member.fit(X, prices)
+            score = member.score(X, prices)
+        return member, score, time.perf_counter() - start
+    except Exception as e:
+        print(f"❌ {MEMBER_LABELS[name]} training failed: {str(e)}")
+        return None, 0, time.perf_counter() - start
+    finally:
+        # The training budget should not leak into inference
+        if budgeted:
+            estimator.set_params(n_jobs=params['n_jobs'])
+
+
 class EnsembleModel:
     """
     Ensemble model combining multiple prediction models
     """
     
-    def __init__(self):
-        self.lstm = LSTMModel(lookback=30)
-        self.transformer = TransformerModel()
+    # Files written by save(), in load order
+    ARTIFACTS = ('lstm.pkl', 'transformer.pkl', 'rf.pkl', 'gb.pkl', 'ridge.pkl', 'meta.pkl')
+    
+    def __init__(self, params=None):
+        """
+        params optionally overrides hyperparameters (e.g. tuned ones):
+        {'lstm': LSTMModel kwargs, 'transformer': TransformerModel kwargs,
+        'weights': {member: weight}}
+        """
+        params = params or {}
+        self.lstm = LSTMModel(**{'lookback': 30, **params.get('lstm', {})})
+        self.transformer = TransformerModel(**params.get('transformer', {}))
         self.rf = RandomForestRegressor(n_estimators=100, random_state=42)
         self.gb = GradientBoostingRegressor(n_estimators=100, random_state=42)
         self.ridge = Ridge(alpha=1.0)
@@ -35,72 +105,200 @@ class EnsembleModel:
             'gradient_boosting': 0.15,
             'ridge': 0.05
         }
+        self.weights.update(params.get('weights', {}))
+        
+        # Length of the training series: the index-based models extrapolate from here
+        self.n_obs = None
+        self.scores = {}
+        self.timings = {}
+        self.trained_at = None
+        self.trained_through = None  # date of the newest bar seen, set by the caller
+        # Last full fit: return/price statistics and n_obs, for update()'s drift check
+        self.reference = None
+        self.n_fit = None
+        self.updates = 0  # incremental updates since the last full fit
+        self._flat = {}  # member name -> flattened tree ensemble for predict
     
-    def train(self, prices):
-        """Train all models"""
-        scores = {}
+    def train(self, prices, n_jobs=None):
+        """
+        Train all models.
         
-        # Train LSTM
-        try:
-            scores['lstm'] = self.lstm.train(prices)
-            print(f"✅ LSTM Score: {scores['lstm']:.4f}")
-        except Exception as e:
-            print(f"❌ LSTM training failed: {str(e)}")
-            scores['lstm'] = 0
+        n_jobs is the core budget: with more than one core, members are fitted
+        concurrently on a process pool and the multi-threaded members share
+        the budget instead of each using every core. Otherwise members are
+        fitted one after another in this process, each multi-threaded one
+        using the whole budget. A daemonic process (a Celery prefork worker,
+        which runs the nightly train_ensembles task) may not start children,
+        so there the sequential path is the one that runs.
+        """
+        self.n_obs = len(prices)
         
-        # Train Transformer
-        try:
-            scores['transformer'] = self.transformer.train(prices)
-            print(f"✅ Transformer Score: {scores['transformer']:.4f}")
-        except Exception as e:
-            print(f"❌ Transformer training failed: {str(e)}")
-            scores['transformer'] = 0
+        fitted = None
+        if n_jobs and n_jobs > 1 and not multiprocessing.current_process().daemon:
+            try:
+                fitted = self._train_parallel(prices, n_jobs)
+            except (OSError, BrokenProcessPool) as e:
+                print(f"⚠️  Parallel training unavailable ({str(e)}), training sequentially")
+        if fitted is None:
+            fitted = {name: _fit_member(name, member, prices, n_jobs) for name, member in self.models.items()}
         
-        # Train simple models with basic features
-        try:
-            X = np.arange(len(prices)).reshape(-1, 1)
-            y = prices
-            
-            self.rf.fit(X, y)
-            scores['random_forest'] = self.rf.score(X, y)
-            print(f"✅ Random Forest Score: {scores['random_forest']:.4f}")
-            
-            self.gb.fit(X, y)
-            scores['gradient_boosting'] = self.gb.score(X, y)
-            print(f"✅ Gradient Boosting Score: {scores['gradient_boosting']:.4f}")
-            
-            self.ridge.fit(X, y)
-            scores['ridge'] = self.ridge.score(X, y)
-            print(f"✅ Ridge Score: {scores['ridge']:.4f}")
-            
-        except Exception as e:
-            print(f"❌ Simple models training failed: {str(e)}")
+        scores, timings = {}, {}
+        for name, (member, score, seconds) in fitted.items():
+            scores[name] = score
+            timings[name] = seconds
+            if member is None:
+                # Keep the untrained member so predict falls back to the last price
+                continue
+            self.models[name] = member
+            print(f"✅ {MEMBER_LABELS[name]} Score: {score:.4f} ({seconds:.1f}s)")
+        
+        # Fitted members come back from the workers as copies
+        for name, attr in MEMBER_ATTRS.items():
+            setattr(self, attr, self.models[name])
+        
+        self.scores = scores
+        self.timings = timings
+        self.trained_at = datetime.utcnow()
+        self.reference = return_stats(prices)
+        self.n_fit = self.n_obs
+        self.updates = 0
+        self._flat = {}
+        return scores
+    
+    def _train_parallel(self, prices, n_jobs):
+        """Fit every member in its own process, splitting n_jobs between the threaded ones"""
+        workers = min(n_jobs, len(self.models))
+        threaded = [name for name, member in self.models.items() if 'n_jobs' in _estimator(member).get_params()]
+        member_jobs = max(1, (n_jobs - (workers - len(threaded))) // max(len(threaded), 1))
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                name: pool.submit(_fit_member, name, member, prices, member_jobs if name in threaded else None)
+                for name, member in self.models.items()
+            }
+            return {name: future.result() for name, future in futures.items()}
+    
+    def update(self, prices, new_bars, window=120, rounds=10, tree_fraction=0.1,
+               drift_threshold=2.0, max_updates=10):
+        """
+        Warm-start every member on the `new_bars` newest closes (the tail of
+        `prices`) instead of refitting on the whole series: boosted members
+        add `rounds` stages and forests regrow `tree_fraction` of their trees
+        on the last `window` bars. Returns the scores on that window, or None
+        when a full retrain is due instead: no full fit on record,
+        `max_updates` since the last one, the bars since then drifted past
+        `drift_threshold`, or closes left the trained price range the member
+        scalers were fitted on (see incremental.drift).
+        A member failing mid-update also returns None; the model should then
+        be retrained rather than used.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        reason = self._retrain_reason(prices, new_bars, window, drift_threshold, max_updates)
+        if reason:
+            print(f"⚠️  Full retrain needed: {reason}")
+            return None
+        
+        # Bar index of every price, continuing from the last fit
+        total = self.n_obs + new_bars
+        X_index = np.arange(total - len(prices), total).reshape(-1, 1)
+        
+        scores, timings = {}, {}
+        for name in self.models:
+            start = time.perf_counter()
+            try:
+                scores[name] = self._update_member(name, prices, new_bars, window, rounds, tree_fraction, X_index)
+            except Exception as e:
+                print(f"❌ {MEMBER_LABELS[name]} update failed: {str(e)}")
+                return None
+            timings[name] = time.perf_counter() - start
+            print(f"✅ {MEMBER_LABELS[name]} updated, recent score: {scores[name]:.4f} ({timings[name]:.2f}s)")
         
+        self.n_obs = total
+        self.updates += 1
+        self.scores = scores
+        self.timings = timings
+        self.trained_at = datetime.utcnow()
+        self._flat = {}
         return scores
     
-    def predict(self, prices, days=7):
-        """Predict using ensemble of all models"""
+    def _retrain_reason(self, prices, new_bars, window, drift_threshold, max_updates):
+        """Why update() cannot be used, or None"""
+        if self.reference is None or self.n_obs is None or self.n_fit is None:
+            return 'no full fit on record'
+        if not all(hasattr(_estimator(member), 'n_features_in_') for member in self.models.values()):
+            return 'a member was never trained'
+        if new_bars > window:
+            return f'{new_bars} new bars exceed the {window}-bar update window'
+        if self.updates >= max_updates:
+            return f'{self.updates} updates since the last full fit'
+        
+        since_fit = self.n_obs + new_bars - self.n_fit
+        if since_fit >= len(prices):
+            return 'history does not reach back to the last full fit'
+        z, excursion = drift(self.reference, prices, since_fit)
+        if z > drift_threshold:
+            return f'return drift {z:.2f} > {drift_threshold}'
+        if excursion > 0:
+            # Updates keep the scalers fixed, so the old stages/trees would
+            # see scaled inputs they were never trained on
+            return f'prices {excursion:.1%} outside the trained range'
+        return None
+    
+    def _update_member(self, name, prices, new_bars, window, rounds, tree_fraction, X_index):
+        """Warm-start one member; returns its score on the recent window"""
+        if name == 'lstm':
+            return self.lstm.update(prices, new_bars, window, rounds)
+        if name == 'transformer':
+            return self.transformer.update(prices, new_bars, window, tree_fraction)
+        if name == 'ridge':
+            # Closed form and cheap: refit the trend line on the whole series
+            self.ridge.fit(X_index, prices)
+            return self.ridge.score(X_index[-window:], prices[-window:])
+        
+        X, y = X_index[-window:], prices[-window:]
+        if name == 'random_forest':
+            replace_trees(self.rf, X, y, tree_fraction)
+        else:
+            add_boosting_rounds(self.gb, X, y, rounds)
+        return self.models[name].score(X, y)
+    
+    def _predictor(self, name):
+        """The member's estimator, flattened once for fast repeated predicts"""
+        if name not in self._flat:
+            self._flat[name] = flatten(self.models[name])
+        return self._flat[name]
+    
+    def predict(self, prices, days=7, new_bars=0):
+        """
+        Predict using ensemble of all models. `new_bars` is how many bars at
+        the tail of `prices` arrived after the last fit; the index-based
+        members forecast from after them, as update() would index them.
+        """
         all_predictions = {}
         
         # LSTM predictions
         try:
             all_predictions['lstm'] = self.lstm.predict(prices, days)
-        except:
+        except Exception as e:
+            print(f"⚠️  LSTM predict failed, holding the last price: {str(e)}")
             all_predictions['lstm'] = np.full(days, prices[-1])
         
         # Transformer predictions
         try:
             all_predictions['transformer'] = self.transformer.predict(prices, days)
-        except:
+        except Exception as e:
+            print(f"⚠️  Transformer predict failed, holding the last price: {str(e)}")
             all_predictions['transformer'] = np.full(days, prices[-1])
         
         # Simple model predictions
         try:
-            X_future = np.arange(len(prices), len(prices) + days).reshape(-1, 1)
-            all_predictions['random_forest'] = self.rf.predict(X_future)
-            all_predictions['gradient_boosting'] = self.gb.predict(X_future)
+            start = len(prices) if self.n_obs is None else self.n_obs + new_bars
+            X_future = np.arange(start, start + days).reshape(-1, 1)
+            all_predictions['random_forest'] = self._predictor('random_forest').predict(X_future)
+            all_predictions['gradient_boosting'] = self._predictor('gradient_boosting').predict(X_future)
             all_predictions['ridge'] = self.ridge.predict(X_future)
-        except:
+        except Exception as e:
+            print(f"⚠️  Index-based members predict failed, holding the last price: {str(e)}")
             all_predictions['random_forest'] = np.full(days, prices[-1])
             all_predictions['gradient_boosting'] = np.full(days, prices[-1])
             all_predictions['ridge'] = np.full(days, prices[-1])
@@ -123,6 +321,17 @@ class EnsembleModel:
         joblib.dump(self.rf, os.path.join(directory, 'rf.pkl'))
         joblib.dump(self.gb, os.path.join(directory, 'gb.pkl'))
         joblib.dump(self.ridge, os.path.join(directory, 'ridge.pkl'))
+        joblib.dump({
+            'weights': self.weights,
+            'n_obs': self.n_obs,
+            'scores': self.scores,
+            'timings': self.timings,
+            'trained_at': self.trained_at,
+            'trained_through': self.trained_through,
+            'reference': self.reference,
+            'n_fit': self.n_fit,
+            'updates': self.updates
+        }, os.path.join(directory, 'meta.pkl'))
     
     def load(self, directory):
         """Load all models"""
@@ -133,3 +342,20 @@ class EnsembleModel:
         self.rf = joblib.load(os.path.join(directory, 'rf.pkl'))
         self.gb = joblib.load(os.path.join(directory, 'gb.pkl'))
         self.ridge = joblib.load(os.path.join(directory, 'ridge.pkl'))
+        
+        meta_path = os.path.join(directory, 'meta.pkl')
+        if os.path.exists(meta_path):
+            meta = joblib.load(meta_path)
+            self.weights = meta['weights']
+            self.n_obs = meta['n_obs']
+            self.scores = meta['scores']
+            self.timings = meta.get('timings', {})
+            self.trained_at = meta['trained_at']
+            self.trained_through = meta.get('trained_through')
+            self.reference = meta.get('reference')
+            self.n_fit = meta.get('n_fit')
+            self.updates = meta.get('updates', 0)
+        
+        self.models.update(random_forest=self.rf, gradient_boosting=self.gb, ridge=self.ridge)
+        self._flat = {}
+        return self
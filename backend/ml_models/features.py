@@ -0,0 +1,79 @@
+"""
+Technical features shared by the price models
+
+compute_features() derives every model's feature columns from one OHLCV
+frame (lowercase columns) in a single pass, so the moving averages, returns
+and volatilities the models have in common are computed once. FEATURE_COLUMNS
+is the superset in a fixed order in which each model's own columns form one
+contiguous run (the scale-free panel set is gathered from across the
+superset), so a stored matrix can serve a model's subset as a slice.
+"""
+import numpy as np
+import pandas as pd
+
+
+# Per-model columns, in the order each model was trained on
+MODEL_COLUMNS = {
+    'rf': [
+        'MA5', 'MA10', 'MA20', 'MA50', 'volatility',
+        'price_change', 'price_change_5d', 'volume_change', 'RSI'
+    ],
+    'xgboost': [
+        'returns', 'log_returns',
+        'ma_5_ratio', 'ma_10_ratio', 'ma_20_ratio',
+        'volatility_10', 'volatility_30', 'volume_ratio'
+    ],
+    # Scale-free, so rows from different symbols are comparable
+    'panel': [
+        'returns', 'price_change_5d',
+        'ma_5_ratio', 'ma_10_ratio', 'ma_20_ratio', 'ma_50_ratio',
+        'volatility_10', 'volatility_30', 'volume_ratio', 'RSI'
+    ],
+}
+FEATURE_COLUMNS = MODEL_COLUMNS['rf'] + MODEL_COLUMNS['xgboost'] + ['ma_50_ratio']
+
+# Leading rows compute_features leaves NaN for lack of history
+FEATURE_WARMUP = {
+    'MA5': 4, 'MA10': 9, 'MA20': 19, 'MA50': 49, 'volatility': 9,
+    'price_change': 1, 'price_change_5d': 5, 'volume_change': 1, 'RSI': 13,
+    'returns': 1, 'log_returns': 1,
+    'ma_5_ratio': 4, 'ma_10_ratio': 9, 'ma_20_ratio': 19,
+    'volatility_10': 10, 'volatility_30': 30, 'volume_ratio': 4, 'ma_50_ratio': 49,
+}
+
+
+def compute_features(frame):
+    """DataFrame of FEATURE_COLUMNS (float64) indexed like `frame`; warm-up rows are NaN"""
+    close = frame['close']
+    volume = frame['volume']
+
+    ma = {window: close.rolling(window=window).mean() for window in (5, 10, 20, 50)}
+    returns = close.pct_change()
+
+    # RSI (simple moving averages of gains and losses)
+    delta = close.diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    rs = gain / loss
+
+    columns = {
+        'MA5': ma[5],
+        'MA10': ma[10],
+        'MA20': ma[20],
+        'MA50': ma[50],
+        'volatility': close.rolling(window=10).std(),
+        'price_change': returns,
+        'price_change_5d': close.pct_change(periods=5),
+        'volume_change': volume.pct_change(),
+        'RSI': 100 - (100 / (1 + rs)),
+        'returns': returns,
+        'log_returns': np.log(close / close.shift(1)),
+        'ma_5_ratio': close / ma[5],
+        'ma_10_ratio': close / ma[10],
+        'ma_20_ratio': close / ma[20],
+        'volatility_10': returns.rolling(window=10).std(),
+        'volatility_30': returns.rolling(window=30).std(),
+        'volume_ratio': volume / volume.rolling(window=5).mean(),
+        'ma_50_ratio': close / ma[50],
+    }
+    return pd.DataFrame(columns, index=frame.index)
@@ -0,0 +1,210 @@
+"""
+Flat tree ensembles - fitted forests as contiguous node arrays
+
+A fitted RandomForestRegressor or GradientBoostingRegressor is flattened into
+one set of arrays for all trees (split feature, threshold, children, leaf
+values). Leaves point to themselves, so evaluation is `max_depth` vectorized
+descent steps over every (tree, row) pair with no per-node branching, and
+none of sklearn's per-call validation: the recursive forecasting loops call
+predict on one row at a time, where that overhead is most of the cost. When
+numba is installed a compiled kernel walks the same arrays instead. Both
+accumulate trees in sklearn's order, so outputs are identical.
+
+Artifacts are one flat file (JSON header, then 64-byte aligned raw arrays)
+that load() maps read-only with a single np.memmap, so every worker process
+on the host shares the same page-cache pages and each loaded model costs one
+file descriptor. (joblib.load(mmap_mode='r') would give the same sharing but
+one mapping, and descriptor, per array.)
+"""
+import json
+import os
+
+import numpy as np
+from sklearn.dummy import DummyRegressor
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+try:
+    import numba
+except ImportError:  # optional: the NumPy evaluator is used instead
+    numba = None
+
+
+FORMAT_VERSION = 1
+MAGIC = b'FLATTREE'
+ALIGN = 64
+ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+# Small batches are where the compiled kernel pays off; large ones vectorize fine
+NUMBA_MAX_ROWS = 64
+
+
+def _accumulate(X, feature, threshold, left, right, value, roots, out, scale):
+    """out[row] += scale * leaf value, tree by tree (compiled with numba when available)"""
+    for t in range(roots.shape[0]):
+        for row in range(X.shape[0]):
+            node = roots[t]
+            while left[node] != node:
+                if X[row, feature[node]] <= threshold[node]:
+                    node = left[node]
+                else:
+                    node = right[node]
+            for k in range(out.shape[1]):
+                out[row, k] += scale * value[node, k]
+
+
+_accumulate_kernel = numba.njit(cache=True, nogil=True)(_accumulate) if numba is not None else None
+
+
+def flatten(estimator):
+    """FlatForest for the estimators it supports, else the estimator unchanged"""
+    if isinstance(estimator, (RandomForestRegressor, GradientBoostingRegressor)):
+        return FlatForest.from_estimator(estimator)
+    return estimator
+
+
+class FlatForest:
+    """Read-only, array-backed replacement for a fitted forest's predict()"""
+
+    def __init__(self, arrays, meta):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.meta = meta
+        self.n_outputs_ = meta['n_outputs']
+        self.n_features_in_ = meta['n_features']
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        """Flatten a fitted RandomForestRegressor or GradientBoostingRegressor"""
+        if isinstance(estimator, RandomForestRegressor):
+            trees = [tree.tree_ for tree in estimator.estimators_]
+            combine = {'average': True}
+        elif isinstance(estimator, GradientBoostingRegressor):
+            # Predictions start from init_ (a constant DummyRegressor, or 0 for
+            # init='zero') and add learning_rate * tree for every stage
+            if isinstance(estimator.init_, DummyRegressor):
+                init = float(np.ravel(estimator.init_.constant_)[0])
+            elif isinstance(estimator.init_, str) and estimator.init_ == 'zero':
+                init = 0.0
+            else:
+                raise TypeError(f"Cannot flatten init={type(estimator.init_).__name__}")
+            trees = [tree.tree_ for tree in estimator.estimators_[:, 0]]
+            combine = {'average': False, 'init': init, 'scale': float(estimator.learning_rate)}
+        else:
+            raise TypeError(f"Cannot flatten {type(estimator).__name__}")
+
+        sizes = np.array([tree.node_count for tree in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        n_nodes = int(sizes.sum())
+        n_outputs = trees[0].n_outputs
+
+        arrays = {
+            'feature': np.zeros(n_nodes, dtype=np.int32),
+            'threshold': np.zeros(n_nodes, dtype=np.float64),
+            'left': np.empty(n_nodes, dtype=np.int32),
+            'right': np.empty(n_nodes, dtype=np.int32),
+            'value': np.empty((n_nodes, n_outputs), dtype=np.float64),
+            'roots': offsets.astype(np.int32),
+        }
+        for tree, offset in zip(trees, offsets):
+            nodes = slice(offset, offset + tree.node_count)
+            own = np.arange(offset, offset + tree.node_count, dtype=np.int32)
+            leaf = tree.children_left == -1
+            # Leaves loop back to themselves so extra descent steps are no-ops
+            arrays['left'][nodes] = np.where(leaf, own, tree.children_left + offset)
+            arrays['right'][nodes] = np.where(leaf, own, tree.children_right + offset)
+            arrays['feature'][nodes] = np.where(leaf, 0, tree.feature)
+            arrays['threshold'][nodes] = tree.threshold
+            arrays['value'][nodes] = tree.value[:, :, 0]
+
+        meta = {
+            'format': FORMAT_VERSION,
+            'n_outputs': n_outputs,
+            'n_features': estimator.n_features_in_,
+            'n_trees': len(trees),
+            'max_depth': max(tree.max_depth for tree in trees),
+            **combine,
+        }
+        return cls(arrays, meta)
+
+    def _leaves(self, X):
+        """Leaf node index per (tree, row) for float32 rows"""
+        rows = np.arange(len(X))
+        node = np.repeat(self.roots[:, None], len(X), axis=1)
+        for _ in range(self.meta['max_depth']):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict(self, X):
+        """Same output as the source estimator's predict(X)"""
+        # sklearn compares float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        average = self.meta.get('average', True)
+        scale = 1.0 if average else self.meta['scale']
+
+        out = np.zeros((len(X), self.n_outputs_))
+        if not average:
+            out += self.meta['init']
+
+        if _accumulate_kernel is not None and len(X) <= NUMBA_MAX_ROWS:
+            _accumulate_kernel(X, self.feature, self.threshold, self.left, self.right,
+                               self.value, self.roots, out, scale)
+        else:
+            terms = scale * self.value[self._leaves(X)]  # (trees, rows, outputs)
+            terms[0] += out
+            # cumsum adds tree by tree, in the same order as sklearn (np.sum
+            # would sum pairwise and round differently)
+            out = np.cumsum(terms, axis=0, out=terms)[-1]
+
+        if average:
+            out /= self.meta['n_trees']
+        return out[:, 0] if self.n_outputs_ == 1 else out
+
+    def save(self, path):
+        """Write the single-file format load() memory-maps"""
+        layout, offset = {}, 0
+        for name in ARRAYS:
+            array = np.ascontiguousarray(getattr(self, name))
+            layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+            offset += -(-array.nbytes // ALIGN) * ALIGN
+        header = json.dumps({'meta': self.meta, 'arrays': layout}).encode()
+        data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(np.uint64(len(header)).tobytes())
+            f.write(header)
+            for name in ARRAYS:
+                f.seek(data_start + layout[name]['offset'])
+                f.write(np.ascontiguousarray(getattr(self, name)).tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Map a saved forest; arrays are read-only views of one shared mapping"""
+        buffer = np.memmap(path, dtype=np.uint8, mode=mmap_mode)
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a flat tree file")
+        header_len = int(buffer[len(MAGIC):len(MAGIC) + 8].view(np.uint64)[0])
+        header_end = len(MAGIC) + 8 + header_len
+        header = json.loads(bytes(buffer[len(MAGIC) + 8:header_end]))
+        if header['meta'].get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat tree format in {path}")
+
+        data_start = -(-header_end // ALIGN) * ALIGN
+        arrays = {
+            name: np.ndarray(
+                tuple(spec['shape']), dtype=np.dtype(spec['dtype']),
+                buffer=buffer, offset=data_start + spec['offset']
+            )
+            for name, spec in header['arrays'].items()
+        }
+        return cls(arrays, header['meta'])
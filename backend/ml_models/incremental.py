@@ -0,0 +1,63 @@
+"""
+Incremental (warm-start) updates for the tree-based price models
+
+Instead of refitting on the full history every night, boosted models get a
+few more stages fitted on the most recent bars and forests swap their oldest
+trees for new ones grown on those bars, so the cost of an update follows the
+number of new bars rather than the length of the history. The drift checks
+here decide when that stops being good enough and a full retrain is due.
+"""
+import numpy as np
+
+
+def add_boosting_rounds(model, X, y, rounds):
+    """Fit `rounds` more stages of a fitted GradientBoostingRegressor on (X, y)"""
+    # warm_start boosts from the existing stages' predictions on the new data
+    model.set_params(warm_start=True, n_estimators=model.n_estimators_ + rounds)
+    try:
+        model.fit(X, y)
+    finally:
+        model.set_params(warm_start=False)
+
+
+def replace_trees(model, X, y, fraction):
+    """Swap the oldest `fraction` of a fitted forest's trees for trees grown on (X, y)"""
+    n_trees = len(model.estimators_)
+    replaced = min(n_trees, max(1, int(round(n_trees * fraction))))
+    model.estimators_ = model.estimators_[replaced:]
+    model.set_params(warm_start=True, n_estimators=n_trees)
+    try:
+        model.fit(X, y)
+    finally:
+        model.set_params(warm_start=False)
+
+
+def return_stats(prices):
+    """Reference statistics of a training series, compared against by drift()"""
+    prices = np.asarray(prices, dtype=np.float64)
+    returns = np.diff(prices) / prices[:-1]
+    return {
+        'return_mean': float(returns.mean()),
+        'return_std': float(returns.std()),
+        'price_min': float(prices.min()),
+        'price_max': float(prices.max()),
+    }
+
+
+def drift(reference, prices, n_new):
+    """
+    How far the last `n_new` bars of `prices` moved from the training series:
+    (RMS z-score of their daily returns under the training mean/std, which is
+    about 1 without drift; excursion outside the training price range as a
+    fraction of that range, 0 inside it).
+    """
+    prices = np.asarray(prices, dtype=np.float64)[-(n_new + 1):]
+    returns = np.diff(prices) / prices[:-1]
+    z = (returns - reference['return_mean']) / max(reference['return_std'], 1e-12)
+    span = max(reference['price_max'] - reference['price_min'], 1e-12)
+    excursion = max(
+        prices[1:].max() - reference['price_max'],
+        reference['price_min'] - prices[1:].min(),
+        0.0
+    ) / span
+    return float(np.sqrt(np.mean(z ** 2))), float(excursion)
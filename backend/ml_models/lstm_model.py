@@ -4,10 +4,14 @@ Note: Full LSTM requires TensorFlow/PyTorch, but keeping it simple with sklearn
 """
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.preprocessing import MinMaxScaler
 import joblib
 
+from .flat_trees import flatten
+from .incremental import add_boosting_rounds
+
 
 class LSTMModel:
     """
@@ -15,25 +19,27 @@ class LSTMModel:
     (Alternative to actual LSTM to keep dependencies FREE)
     """
     
-    def __init__(self, lookback=60):
+    def __init__(self, lookback=60, n_estimators=200, learning_rate=0.1, max_depth=5):
         self.lookback = lookback
         self.model = GradientBoostingRegressor(
-            n_estimators=200,
-            learning_rate=0.1,
-            max_depth=5,
+            n_estimators=n_estimators,
+            learning_rate=learning_rate,
+            max_depth=max_depth,
             random_state=42
         )
         self.scaler = MinMaxScaler()
+        self._flat = None  # flattened copy of self.model for recursive predict
         
     def prepare_sequences(self, data):
-        """Prepare time series sequences"""
-        X, y = [], []
-        
-        for i in range(self.lookback, len(data)):
-            X.append(data[i-self.lookback:i])
-            y.append(data[i])
+        """
+        Prepare time series sequences. X is a strided read-only view over
+        `data` (row i is data[i:i+lookback]), so no window is copied here.
+        """
+        data = np.asarray(data)
+        X = sliding_window_view(data, self.lookback)[:-1]
+        y = data[self.lookback:]
         
-        return np.array(X), np.array(y)
+        return X, y
     
     def train(self, prices):
         """Train the model"""
@@ -45,6 +51,23 @@ class LSTMModel:
         
         # Train
         self.model.fit(X, y)
+        self._flat = None
+        
+        return self.model.score(X, y)
+    
+    def update(self, prices, new_bars, window=120, rounds=10):
+        """
+        Warm-start update after `new_bars` new closes (the tail of `prices`):
+        `rounds` boosting stages are fitted on the last `window` sequences.
+        The scaler stays as fitted, since the existing stages were trained on
+        its scaling. Returns the score on them.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        
+        tail = prices[-(window + self.lookback):]
+        X, y = self.prepare_sequences(self.scaler.transform(tail.reshape(-1, 1)).flatten())
+        add_boosting_rounds(self.model, X, y, rounds)
+        self._flat = None
         
         return self.model.score(X, y)
     
@@ -53,19 +76,19 @@ class LSTMModel:
         # Scale recent prices
         scaled_prices = self.scaler.transform(recent_prices.reshape(-1, 1)).flatten()
         
-        predictions = []
-        current_sequence = scaled_prices[-self.lookback:]
+        # One buffer for the seed window plus every forecast: step i reads
+        # the contiguous window buffer[i:i+lookback] and writes one value
+        buffer = np.empty(self.lookback + days)
+        buffer[:self.lookback] = scaled_prices[-self.lookback:]
         
-        for _ in range(days):
-            # Predict next value
-            next_pred = self.model.predict(current_sequence.reshape(1, -1))[0]
-            predictions.append(next_pred)
-            
-            # Update sequence
-            current_sequence = np.append(current_sequence[1:], next_pred)
+        if self._flat is None:
+            self._flat = flatten(self.model)
+        for i in range(days):
+            window = buffer[i:i + self.lookback].reshape(1, -1)
+            buffer[self.lookback + i] = self._flat.predict(window)[0]
         
         # Inverse transform predictions
-        predictions = self.scaler.inverse_transform(np.array(predictions).reshape(-1, 1)).flatten()
+        predictions = self.scaler.inverse_transform(buffer[self.lookback:].reshape(-1, 1)).flatten()
         
         return predictions
     
@@ -83,3 +106,4 @@ class LSTMModel:
         self.model = data['model']
         self.scaler = data['scaler']
         self.lookback = data['lookback']
+        self._flat = None
@@ -0,0 +1,130 @@
+"""
+Panel Model - one cross-sectional forest for the whole symbol universe
+
+Rows from every symbol share scale-free features (MODEL_COLUMNS['panel']:
+returns, MA ratios, return volatility, volume ratio, RSI) and targets (the
+cumulative return 1..horizons days ahead), so a single multi-output forest
+fitted on the stacked rows can forecast any symbol, including ones it never
+saw. Optional per-symbol adjustments add each training symbol's shrunk mean
+out-of-bag residual. The forest is stored as a FlatForest, so every worker
+maps the same file.
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from .features import MODEL_COLUMNS
+from .flat_trees import FlatForest
+
+
+PANEL_COLUMNS = MODEL_COLUMNS['panel']
+
+
+def panel_targets(closes, horizons):
+    """(n, horizons) cumulative returns from each close to h days ahead; NaN past the end"""
+    closes = np.asarray(closes, dtype=np.float64)
+    targets = np.full((len(closes), horizons), np.nan)
+    for h in range(1, horizons + 1):
+        targets[:-h, h - 1] = closes[h:] / closes[:-h] - 1
+    return targets
+
+
+class PanelModel:
+    """Global forest over stacked per-symbol feature rows"""
+
+    # Files written by save()
+    ARTIFACTS = ('forest.bin', 'meta.json')
+
+    def __init__(self, horizons, n_estimators=100, max_depth=12, min_samples_leaf=20,
+                 max_samples=200_000, shrinkage=50):
+        self.horizons = horizons
+        self.params = {
+            'n_estimators': n_estimators,
+            'max_depth': max_depth,
+            'min_samples_leaf': min_samples_leaf,
+            'max_samples': max_samples,
+        }
+        self.shrinkage = shrinkage
+        self.model = None
+        self.adjustments = {}  # symbol -> per-horizon return adjustment
+        self.symbols = []
+        self.n_rows = 0
+        self.trained_at = None
+
+    def fit(self, X, y, codes, symbols, residuals=True):
+        """
+        X: (n, len(PANEL_COLUMNS)) float32 (a memmap is used in place),
+        y: (n, horizons) targets, codes: (n,) index into `symbols` per row.
+        Returns the out-of-bag R^2 when residuals are fitted, else None.
+        """
+        n_rows = len(X)
+        forest = RandomForestRegressor(
+            n_estimators=self.params['n_estimators'],
+            max_depth=self.params['max_depth'],
+            min_samples_leaf=self.params['min_samples_leaf'],
+            # Bootstrap samples are capped so tree cost stops growing with the universe
+            max_samples=min(n_rows, self.params['max_samples']),
+            oob_score=residuals,
+            random_state=42,
+            n_jobs=-1
+        )
+        forest.fit(X, y)
+
+        self.adjustments = {}
+        if residuals:
+            oob = forest.oob_prediction_.reshape(n_rows, -1)
+            seen = np.isfinite(oob).all(axis=1)
+            residual = np.where(seen[:, None], np.asarray(y) - oob, 0.0)
+            counts = np.bincount(codes[seen], minlength=len(symbols))
+            sums = np.zeros((len(symbols), self.horizons))
+            np.add.at(sums, codes, residual)
+            # Shrink toward the global model: symbols with few rows barely move
+            shrunk = sums / (counts[:, None] + self.shrinkage)
+            self.adjustments = {symbol: shrunk[i].tolist() for i, symbol in enumerate(symbols) if counts[i]}
+
+        self.model = FlatForest.from_estimator(forest)
+        self.symbols = list(symbols)
+        self.n_rows = n_rows
+        self.trained_at = datetime.utcnow()
+        return forest.oob_score_ if residuals else None
+
+    def predict(self, features, symbol=None):
+        """(horizons,) cumulative returns for one feature row of `symbol`"""
+        returns = np.atleast_2d(self.model.predict(np.asarray(features).reshape(1, -1)))[0]
+        adjustment = self.adjustments.get(symbol)
+        if adjustment is not None:
+            returns = returns + np.asarray(adjustment)
+        return returns
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.model.save(os.path.join(directory, 'forest.bin'))
+        with open(os.path.join(directory, 'meta.json'), 'w') as f:
+            json.dump({
+                'horizons': self.horizons,
+                'columns': PANEL_COLUMNS,
+                'params': self.params,
+                'shrinkage': self.shrinkage,
+                'adjustments': self.adjustments,
+                'symbols': self.symbols,
+                'n_rows': self.n_rows,
+                'trained_at': self.trained_at.isoformat() if self.trained_at else None,
+            }, f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta['columns'] != PANEL_COLUMNS:
+            raise ValueError('Panel model was trained on different features')
+
+        panel = cls(meta['horizons'], shrinkage=meta['shrinkage'], **meta['params'])
+        panel.model = FlatForest.load(os.path.join(directory, 'forest.bin'))
+        panel.adjustments = meta['adjustments']
+        panel.symbols = meta['symbols']
+        panel.n_rows = meta['n_rows']
+        panel.trained_at = datetime.fromisoformat(meta['trained_at']) if meta['trained_at'] else None
+        return panel
@@ -0,0 +1,27 @@
+"""
+Tuned hyperparameters
+
+Reads the {family: params} file written by ``ml_models.tuning --apply``.
+Nothing here imports a model, so serving code can read the file without
+loading the tuner and every backtested model family.
+"""
+import json
+
+
+def load_tuned_params(path):
+    """{family: params} from a file written by tuning.apply_best, or {} if there is none"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def ensemble_params(path):
+    """EnsembleModel params: the tuned lstm/transformer members and the tuned member weights"""
+    tuned = load_tuned_params(path)
+    return {
+        'lstm': tuned.get('lstm', {}),
+        'transformer': tuned.get('transformer', {}),
+        'weights': tuned.get('ensemble', {}).get('weights', {}),
+    }
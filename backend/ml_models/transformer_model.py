@@ -7,22 +7,69 @@ from sklearn.preprocessing import StandardScaler
 import joblib
 import pandas as pd
 
+from .flat_trees import flatten
+from .incremental import replace_trees
+
+class RollingFeatureState:
+    """
+    Incremental version of TransformerModel.create_features for recursive
+    forecasting. Every feature only looks back WINDOW prices, so the state is
+    a short buffer of recent prices: appending a price and computing the next
+    feature row are O(1) in the length of the history.
+    """
+    
+    WINDOW = 20  # MA20 is the longest lookback
+    
+    def __init__(self, prices):
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(prices) < self.WINDOW:
+            raise ValueError(f"Need at least {self.WINDOW} prices, got {len(prices)}")
+        # Extra capacity so appends only shift the buffer once every WINDOW steps
+        self._buffer = np.empty(2 * self.WINDOW)
+        self._buffer[:self.WINDOW] = prices[-self.WINDOW:]
+        self._end = self.WINDOW
+    
+    def append(self, price):
+        if self._end == len(self._buffer):
+            self._buffer[:self.WINDOW] = self._buffer[self._end - self.WINDOW:self._end]
+            self._end = self.WINDOW
+        self._buffer[self._end] = price
+        self._end += 1
+    
+    def features(self):
+        """Feature row for the latest price, in create_features column order"""
+        w = self._buffer[self._end - self.WINDOW:self._end]
+        price = w[-1]
+        ma20 = w.mean()
+        return np.array([
+            w[-5:].mean(),                 # MA5
+            w[-10:].mean(),                # MA10
+            ma20,                          # MA20
+            price - w[-6],                 # momentum
+            w[-10:].std(ddof=1),           # volatility
+            (price - w[-6]) / w[-6],       # ROC
+            (price - ma20) / ma20,         # price_position
+            w[-2], w[-3], w[-4],           # lag_1..lag_3
+        ])
+
+
 class TransformerModel:
     """
     Simplified Transformer-style model using Random Forest
     """
     
-    def __init__(self, n_features=10):
+    def __init__(self, n_features=10, n_estimators=150, max_depth=15, min_samples_split=5, min_samples_leaf=2):
         self.n_features = n_features
         self.model = RandomForestRegressor(
-            n_estimators=150,
-            max_depth=15,
-            min_samples_split=5,
-            min_samples_leaf=2,
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            min_samples_split=min_samples_split,
+            min_samples_leaf=min_samples_leaf,
             random_state=42,
             n_jobs=-1
         )
         self.scaler = StandardScaler()
+        self._flat = None  # flattened copy of self.model for recursive predict
     
     def create_features(self, prices):
         """Create features from price series"""
@@ -65,29 +112,46 @@ class TransformerModel:
         
         # Train
         self.model.fit(X_scaled, y)
+        self._flat = None
+        
+        return self.model.score(X_scaled, y)
+    
+    def update(self, prices, new_bars, window=120, tree_fraction=0.1):
+        """
+        Warm-start update after `new_bars` new closes (the tail of `prices`):
+        the oldest `tree_fraction` of the forest is regrown on the last
+        `window` rows. The scaler stays as fitted, since the kept trees were
+        trained on its scaling. Returns the score on them.
+        """
+        df = self.create_features(np.asarray(prices, dtype=np.float64)[-(window + RollingFeatureState.WINDOW - 1):])
+        
+        feature_cols = [col for col in df.columns if col != 'price']
+        X = df[feature_cols].values
+        y = df['price'].values
+        
+        X_scaled = self.scaler.transform(X)
+        replace_trees(self.model, X_scaled, y, tree_fraction)
+        self._flat = None
         
         return self.model.score(X_scaled, y)
     
     def predict(self, prices, days=7):
         """Predict future prices"""
-        predictions = []
-        current_prices = prices.copy()
+        predictions = np.empty(days)
+        state = RollingFeatureState(prices)
         
-        for _ in range(days):
-            # Create features
-            df = self.create_features(current_prices)
-            
-            feature_cols = [col for col in df.columns if col != 'price']
-            X = df[feature_cols].iloc[-1:].values
-            
+        if self._flat is None:
+            self._flat = flatten(self.model)
+        # StandardScaler.transform's arithmetic, without its per-call validation
+        mean, scale = self.scaler.mean_, self.scaler.scale_
+        for i in range(days):
             # Scale and predict
-            X_scaled = self.scaler.transform(X)
-            pred = self.model.predict(X_scaled)[0]
+            X_scaled = ((state.features() - mean) / scale).reshape(1, -1)
+            predictions[i] = self._flat.predict(X_scaled)[0]
             
-            predictions.append(pred)
-            current_prices = np.append(current_prices, pred)
+            state.append(predictions[i])
         
-        return np.array(predictions)
+        return predictions
     
     def save(self, filepath):
         """Save model"""
@@ -101,3 +165,4 @@ class TransformerModel:
         data = joblib.load(filepath)
         self.model = data['model']
         self.scaler = data['scaler']
+        self._flat = None
@@ -0,0 +1,327 @@
+"""
+Hyperparameter search for the price models
+
+An optuna study per search: configurations are suggested by a seeded TPE
+sampler from a per-family search space and scored on walk-forward CV folds
+(the backtest's forecast origins, newest first and interleaved across
+symbols). Folds are the pruning budget: a trial is scored on min_folds,
+then eta times as many, and so on up to the full set, reporting its
+objective after each rung so the pruner (SuccessiveHalvingPruner, or
+HyperbandPruner for several brackets) can stop unpromising configurations
+early. A trial's folds run in parallel on a process pool. Studies persist
+in an SQLite database, so an interrupted search resumes where it stopped:
+finished trials are kept, and a trial that was running when the process
+died is retried with the same parameters.
+
+The objective is MAPE (%) plus latency_weight * mean predict time (ms), so
+a configuration has to be worth its serving cost. The 'ensemble' family only
+searches the member weights; its folds build the lstm and transformer
+members with their currently tuned params, as MLService does, so tune those
+families first.
+
+Usage:
+    python -m ml_models.tuning AAPL MSFT --family lstm --method hyperband --study lstm_v1
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import optuna
+from optuna.storages import RDBStorage, RetryFailedTrialCallback
+
+from .backtest import _run_fold, fold_origins
+from .ensemble import MEMBER_ATTRS
+from .params import ensemble_params, load_tuned_params
+
+
+# family -> {param: (kind, low, high)}; kinds: int, float, log (float, log-uniform), simplex
+SEARCH_SPACES = {
+    'lstm': {
+        'lookback': ('int', 20, 90),
+        'n_estimators': ('int', 50, 300),
+        'max_depth': ('int', 2, 6),
+        'learning_rate': ('log', 0.02, 0.3),
+    },
+    'transformer': {
+        'n_estimators': ('int', 50, 300),
+        'max_depth': ('int', 5, 20),
+        'min_samples_leaf': ('int', 1, 10),
+    },
+    'rf': {
+        'n_estimators': ('int', 50, 300),
+        'max_depth': ('int', 4, 16),
+        'min_samples_split': ('int', 2, 20),
+    },
+    'xgboost': {
+        'n_estimators': ('int', 50, 400),
+        'max_depth': ('int', 2, 8),
+        'learning_rate': ('log', 0.01, 0.3),
+        'subsample': ('float', 0.5, 1.0),
+        'colsample_bytree': ('float', 0.5, 1.0),
+        'min_child_weight': ('log', 1.0, 20.0),
+    },
+    # Member weights of the EnsembleModel
+    'ensemble': {
+        'weights': ('simplex', list(MEMBER_ATTRS), None),
+    },
+}
+
+
+def suggest_config(trial, space):
+    """One configuration from a search space, suggested by an optuna trial"""
+    params = {}
+    for name, (kind, low, high) in space.items():
+        if kind == 'int':
+            params[name] = trial.suggest_int(name, low, high)
+        elif kind == 'float':
+            params[name] = trial.suggest_float(name, low, high)
+        elif kind == 'log':
+            params[name] = trial.suggest_float(name, low, high, log=True)
+        elif kind == 'simplex':
+            # Independent draws normalized onto the simplex
+            raw = [trial.suggest_float(f'{name}.{member}', 0.0, 1.0) for member in low]
+            total = sum(raw) or 1.0
+            params[name] = {member: round(w / total, 4) for member, w in zip(low, raw)}
+        else:
+            raise ValueError(f"Unknown parameter kind: {kind}")
+    return params
+
+
+class FoldError(Exception):
+    """A CV fold failed; the trial is recorded as failed and the study moves on"""
+
+
+def cv_folds(frames, horizon, step, min_train):
+    """[(symbol, origin), ...] newest first, interleaved across symbols"""
+    per_symbol = [
+        [(symbol, origin) for origin in reversed(fold_origins(len(frame), min_train, step, horizon))]
+        for symbol, frame in frames.items()
+    ]
+    folds = []
+    for i in range(max((len(f) for f in per_symbol), default=0)):
+        folds.extend(f[i] for f in per_symbol if i < len(f))
+    return folds
+
+
+def apply_best(report, path):
+    """Merge the report's best configuration into the tuned-params file the services read"""
+    tuned = load_tuned_params(path)
+    tuned[report['family']] = report['best']['params']
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(tuned, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class Tuner:
+    """
+    Budgeted optuna search over one model family, persisted as `study` in
+    `storage` (an SQLAlchemy URL). base_params are fixed params every
+    suggested configuration is merged into (e.g. the tuned members of the
+    ensemble).
+    """
+
+    def __init__(self, family, frames, study, storage, horizon=5, step=21, min_train=252,
+                 window=None, latency_weight=0.01, workers=None, seed=42, base_params=None):
+        if family not in SEARCH_SPACES:
+            raise ValueError(f"Unknown model family: {family}")
+        self.family = family
+        self.space = SEARCH_SPACES[family]
+        self.frames = frames
+        self.study_name = study
+        self.storage = storage
+        self.horizon = horizon
+        self.window = window
+        self.base_params = base_params or {}
+        # A study's trials are only comparable under the same CV setup
+        self.context = {
+            'family': family,
+            'symbols': list(frames),
+            'horizon': horizon,
+            'step': step,
+            'min_train': min_train,
+            'window': window,
+            'latency_weight': latency_weight,
+            'base_params': self.base_params,
+        }
+        self.latency_weight = latency_weight
+        self.workers = workers
+        self.seed = seed
+        self.folds = cv_folds(frames, horizon, step, min_train)
+
+    def _study(self, pruner):
+        """Create the study, or load it to resume; a trial left running by a dead process is retried once"""
+        storage = RDBStorage(self.storage, heartbeat_interval=60,
+                             failed_trial_callback=RetryFailedTrialCallback(max_retry=1))
+        study = optuna.create_study(
+            study_name=self.study_name, storage=storage, load_if_exists=True, direction='minimize',
+            sampler=optuna.samplers.TPESampler(seed=self.seed), pruner=pruner,
+        )
+        context = study.user_attrs.get('context')
+        if context is None:
+            study.set_user_attr('context', self.context)
+        elif context != self.context:
+            raise ValueError(f"Study {self.study_name} was run with a different setup: {context}")
+        return study
+
+    def _objective(self, pool, trial, min_folds, eta):
+        """Objective over rungs of min_folds * eta**k folds, reported after each so the pruner can stop the trial"""
+        params = suggest_config(trial, self.space)
+        trial.set_user_attr('params', params)
+
+        mapes, predict_ms = [], []
+        budget = min_folds
+        while True:
+            budget = min(budget, len(self.folds))
+            futures = []
+            for symbol, origin in self.folds[len(mapes):budget]:
+                frame = self.frames[symbol]
+                first = 0 if self.window is None else max(0, origin - self.window)
+                futures.append((symbol, origin, pool.submit(
+                    _run_fold, self.family, frame.iloc[first:origin], self.horizon, {**self.base_params, **params}
+                )))
+            for symbol, origin, future in futures:
+                forecast, _, predict_s, error = future.result()
+                if forecast is None:
+                    for *_, pending in futures:
+                        pending.cancel()
+                    trial.set_user_attr('error', f"{symbol} @ {origin}: {error}")
+                    raise FoldError(error)
+                actual = self.frames[symbol]['close'].values[origin:origin + self.horizon]
+                mapes.append(float(np.mean(np.abs(forecast - actual) / np.abs(actual)) * 100))
+                predict_ms.append(predict_s * 1000)
+
+            mape, latency = float(np.mean(mapes)), float(np.mean(predict_ms))
+            objective = mape + self.latency_weight * latency
+            trial.set_user_attr('folds', len(mapes))
+            trial.set_user_attr('mape', mape)
+            trial.set_user_attr('predict_ms', latency)
+            if budget == len(self.folds):
+                return objective
+
+            trial.report(objective, budget)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+            budget *= eta
+
+    def run(self, method='hyperband', trials=27, min_folds=1, eta=3):
+        """Run the study up to `trials` finished trials and return a report; only trials scored on every fold rank"""
+        if not self.folds:
+            raise ValueError('Not enough history for a single CV fold')
+
+        min_folds = min(min_folds, len(self.folds))
+        if method == 'halving':
+            pruner = optuna.pruners.SuccessiveHalvingPruner(min_resource=min_folds, reduction_factor=eta)
+        elif method == 'hyperband':
+            pruner = optuna.pruners.HyperbandPruner(
+                min_resource=min_folds, max_resource=len(self.folds), reduction_factor=eta
+            )
+        else:
+            raise ValueError(f"Unknown search method: {method}")
+
+        study = self._study(pruner)
+        finished = sum(trial.state.is_finished() for trial in study.trials)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            study.optimize(
+                lambda trial: self._objective(pool, trial, min_folds, eta),
+                n_trials=max(0, trials - finished), catch=(FoldError,)
+            )
+
+        complete = study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,))
+        leaderboard = [
+            {
+                'trial': trial.number,
+                'params': trial.user_attrs['params'],
+                'folds': trial.user_attrs['folds'],
+                'objective': trial.value,
+                'mape': trial.user_attrs['mape'],
+                'predict_ms': trial.user_attrs['predict_ms'],
+            }
+            for trial in sorted(complete, key=lambda trial: trial.value)
+        ]
+        states = [trial.state.name.lower() for trial in study.trials]
+
+        return {
+            'generated_at': datetime.utcnow().isoformat(),
+            'family': self.family,
+            'study': self.study_name,
+            'config': {
+                **self.context,
+                'method': method,
+                'folds': len(self.folds),
+                'eta': eta,
+                'min_folds': min_folds,
+                'seed': self.seed,
+            },
+            'trials': {state: states.count(state) for state in sorted(set(states))},
+            'best': leaderboard[0] if leaderboard else None,
+            'leaderboard': leaderboard[:10],
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hyperparameter search for the price models')
+    parser.add_argument('symbols', nargs='+')
+    parser.add_argument('--family', required=True, choices=sorted(SEARCH_SPACES))
+    parser.add_argument('--method', default='hyperband', choices=('hyperband', 'halving'))
+    parser.add_argument('--trials', type=int, default=27, help='finished trials the study is run up to')
+    parser.add_argument('--eta', type=int, default=3, help='keep the best 1/eta per rung')
+    parser.add_argument('--min-folds', type=int, default=1, help='folds in the first rung')
+    parser.add_argument('--period', default='5y', help='history loaded per symbol')
+    parser.add_argument('--horizon', type=int, default=5)
+    parser.add_argument('--step', type=int, default=21, help='bars between forecast origins')
+    parser.add_argument('--min-train', type=int, default=252)
+    parser.add_argument('--window', type=int, default=None, help='rolling window in bars (default: expanding)')
+    parser.add_argument('--latency-weight', type=float, default=0.01, help='objective points per ms of predict time')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--study', default=None, help='study name; rerun with the same name to resume')
+    parser.add_argument('--apply', action='store_true', help='write the best params to TUNED_PARAMS_PATH')
+    args = parser.parse_args(argv)
+
+    from config.config import Config
+    from services.ml_service import MLService
+    frames = {}
+    for symbol in args.symbols:
+        frame = MLService.load_history(symbol.upper(), period=args.period)
+        if frame is None:
+            print(f"❌ No history for {symbol}")
+            continue
+        frames[symbol.upper()] = frame
+
+    study = args.study or f"{args.family}_{datetime.utcnow():%Y%m%d_%H%M%S}"
+    out = os.path.join('reports', 'tuning', study)
+    base_params = None
+    if args.family == 'ensemble':
+        base_params = ensemble_params(Config.TUNED_PARAMS_PATH)
+        base_params.pop('weights')
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    if os.path.exists(f'{out}.db'):
+        print(f"↻ Resuming {study}")
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    tuner = Tuner(args.family, frames, study, f'sqlite:///{out}.db', args.horizon, args.step, args.min_train,
+                  args.window, args.latency_weight, args.workers, args.seed, base_params)
+
+    report = tuner.run(args.method, args.trials, args.min_folds, args.eta)
+    with open(f'{out}.json', 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    best = report['best']
+    if best is None:
+        # Every trial was pruned or had a failed fold: there is no score to report or apply
+        print(f"❌ No {args.family} configuration succeeded on every fold")
+    else:
+        print(f"Best {args.family} on {best['folds']} folds: MAPE {best['mape']:.2f}%  "
+              f"predict {best['predict_ms']:.1f}ms  objective {best['objective']:.3f}")
+        print(f"  {json.dumps(best['params'], sort_keys=True)}")
+        if args.apply:
+            apply_best(report, Config.TUNED_PARAMS_PATH)
+            print(f"✅ Applied to {Config.TUNED_PARAMS_PATH}")
+    print(f"✅ Report written to {out}.json")
+
+if __name__ == '__main__':
+    main()
@@ -6,83 +6,78 @@ import pandas as pd
 import xgboost as xgb
 from sklearn.preprocessing import MinMaxScaler
 
+from .features import MODEL_COLUMNS, compute_features
+
 
 class XGBoostModel:
     """XGBoost-based price predictor"""
     
     @staticmethod
-    def prepare_features(df):
-        """Extract features for XGBoost"""
-        data = df.copy()
-        
-        # Price features
-        data['returns'] = data['close'].pct_change()
-        data['log_returns'] = np.log(data['close'] / data['close'].shift(1))
-        
-        # Moving averages
-        for window in [5, 10, 20]:
-            data[f'ma_{window}'] = data['close'].rolling(window=window).mean()
-            data[f'ma_{window}_ratio'] = data['close'] / data[f'ma_{window}']
-        
-        # Volatility
-        data['volatility_10'] = data['returns'].rolling(window=10).std()
-        data['volatility_30'] = data['returns'].rolling(window=30).std()
+    def prepare_features(df, horizons=1, symbol=None):
+        """
+        Extract features for XGBoost. Targets target_1..target_<horizons> are
+        the cumulative returns from today's close to h days ahead; the latest
+        rows have NaN targets and are kept so they can be used for inference.
+        Features are float32; with a symbol they come from the shared feature
+        store instead of being recomputed here.
+        """
+        feature_cols = MODEL_COLUMNS['xgboost']
+        if symbol is not None:
+            from services.feature_store import feature_store
+            features = feature_store.frame(symbol, df, feature_cols)
+        else:
+            features = compute_features(df)[feature_cols].astype(np.float32)
+        data = pd.concat([df, features], axis=1)
         
-        # Volume
-        data['volume_ma_5'] = data['volume'].rolling(window=5).mean()
-        data['volume_ratio'] = data['volume'] / data['volume_ma_5']
+        # Targets: cumulative return over the next h days (target_1 is next day's return)
+        for h in range(1, horizons + 1):
+            data[f'target_{h}'] = data['close'].shift(-h) / data['close'] - 1
+        data['target'] = data['target_1']
         
-        # Target: next day's return
-        data['target'] = data['returns'].shift(-1)
-        
-        data = data.dropna()
-        
-        feature_cols = [
-            'returns', 'log_returns',
-            'ma_5_ratio', 'ma_10_ratio', 'ma_20_ratio',
-            'volatility_10', 'volatility_30', 'volume_ratio'
-        ]
+        data = data.dropna(subset=feature_cols)
         
         return data, feature_cols
     
     @staticmethod
-    def predict(df, days=7):
-        """Train and predict using XGBoost"""
+    def predict(df, days=7, params=None, symbol=None):
+        """
+        Train and predict using XGBoost. One multi-output model maps today's
+        features to the return at every horizon 1..days, so the whole path
+        comes from a single predict call. params overrides the regressor's
+        hyperparameters (by default the tuned 'xgboost' params); with a
+        symbol, features come from the feature store.
+        """
         try:
-            data, feature_cols = XGBoostModel.prepare_features(df)
+            data, feature_cols = XGBoostModel.prepare_features(df, horizons=days, symbol=symbol)
+            target_cols = [f'target_{h}' for h in range(1, days + 1)]
+            train = data.dropna(subset=target_cols)
             
-            if len(data) < 50:
+            if len(train) < 50:
                 return None
             
-            X = data[feature_cols].values
-            y = data['target'].values
+            X = train[feature_cols].values
+            y = train[target_cols].values
             
+            if params is None:
+                from services.ml_service import MLService
+                params = MLService.tuned_params('xgboost')
+
             # Train on all data (in production, use train/test split)
-            model = xgb.XGBRegressor(
-                n_estimators=100,
-                max_depth=5,
-                learning_rate=0.1,
-                random_state=42
-            )
+            model = xgb.XGBRegressor(**{
+                'n_estimators': 100,
+                'max_depth': 5,
+                'learning_rate': 0.1,
+                'random_state': 42,
+                **params
+            })
             
             model.fit(X, y)
             
-            # Predict next days iteratively
+            # Predict every horizon from the latest bar's features
             last_close = df['close'].iloc[-1]
-            predictions = []
-            current_price = last_close
-            
-            for _ in range(days):
-                # Use last known features
-                last_features = X[-1:].copy()
-                predicted_return = model.predict(last_features)[0]
-                
-                # Calculate next price
-                next_price = current_price * (1 + predicted_return)
-                predictions.append(float(next_price))
-                current_price = next_price
+            predicted_returns = np.atleast_1d(model.predict(data[feature_cols].values[-1:])[0])
             
-            return np.array(predictions)
+            return last_close * (1 + predicted_returns)
             
         except Exception as e:
             print(f"XGBoostModel error: {e}")
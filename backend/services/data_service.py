@@ -1,10 +1,58 @@
 """
-Data Service - FREE stock data using yfinance
+Data Service - FREE stock data (yfinance by default, see market_data)
 """
-import yfinance as yf
+import sqlite3
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from config.database import db, Stock, StockPrice
+from datetime import date, datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from config.config import Config
+from config.database import db, Stock, StockPrice, CheckedPriceRange
+from .price_store import (
+    price_store, period_start, last_session, frame_to_block, block_dates,
+    FRAME_COLUMNS, COLUMNS, DATE,
+)
+from .intraday_cache import intraday_cache
+from .quote_cache import QuoteCache, SingleFlight
+from .symbol_index import symbol_index
+from .market_data import get_provider
+from utils.serialization import ohlcv_records
+
+PRICE_VALUE_COLUMNS = COLUMNS[1:]
+
+quote_cache = QuoteCache(Config.QUOTE_CACHE_TTL_SECONDS, Config.QUOTE_CACHE_MAX_ENTRIES)
+
+# Stock column -> provider `info` key
+STOCK_INFO_FIELDS = {
+    'company_name': 'longName',
+    'sector': 'sector',
+    'industry': 'industry',
+    'description': 'longBusinessSummary',
+    'market_cap': 'marketCap',
+    'pe_ratio': 'trailingPE',
+    'current_price': 'currentPrice',
+    'previous_close': 'previousClose',
+    'open_price': 'open',
+    'day_high': 'dayHigh',
+    'day_low': 'dayLow',
+    'volume': 'volume',
+    'fifty_two_week_high': 'fiftyTwoWeekHigh',
+    'fifty_two_week_low': 'fiftyTwoWeekLow',
+    'beta': 'beta',
+}
+
+info_flight = SingleFlight()
+_info_refresh_pool = ThreadPoolExecutor(max_workers=Config.STOCK_INFO_REFRESH_WORKERS)
+_info_refreshing = set()
+_info_lock = threading.Lock()
+_info_stats = {'fresh': 0, 'stale': 0, 'misses': 0, 'refreshes': 0}
 
 
 class DataService:
@@ -12,58 +60,281 @@ class DataService:
     
     @staticmethod
     def fetch_stock_info(symbol):
-        """Fetch basic stock information"""
+        """Fetch basic stock information (served from the stocks table, see fetch_stock_infos)"""
+        return DataService.fetch_stock_infos([symbol]).get(symbol.upper())
+    
+    @staticmethod
+    def fetch_stock_infos(symbols):
+        """
+        {symbol: info} for many symbols with one DB read. Rows older than
+        CACHE_STOCK_DATA_HOURS are served as-is and refreshed in the
+        background; unknown symbols are fetched concurrently (misses for the
+        same symbol share one upstream call) and stored.
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        if not has_app_context():
+            infos = {}
+            for symbol in symbols:
+                raw = DataService._fetch_stock_info_upstream(symbol)
+                if raw:
+                    infos[symbol] = DataService._apply_stock_info(Stock(symbol=symbol), raw).to_info()
+            return infos
+        
         try:
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+            stocks = {s.symbol: s for s in Stock.query.filter(Stock.symbol.in_(symbols)).all()}
+            cutoff = datetime.utcnow() - timedelta(hours=Config.CACHE_STOCK_DATA_HOURS)
+            
+            infos, misses = {}, []
+            for symbol in symbols:
+                stock = stocks.get(symbol)
+                # description is always set once metadata has been fetched
+                if stock is None or stock.description is None or stock.last_updated is None:
+                    misses.append(symbol)
+                    continue
+                infos[symbol] = stock.to_info()
+                stale = stock.last_updated < cutoff
+                with _info_lock:
+                    _info_stats['stale' if stale else 'fresh'] += 1
+                if stale:
+                    DataService._schedule_info_refresh(symbol)
+            
+            if misses:
+                with _info_lock:
+                    _info_stats['misses'] += len(misses)
+                fetch = lambda s: info_flight.do(s, lambda: DataService._fetch_stock_info_upstream(s))
+                with ThreadPoolExecutor(max_workers=min(len(misses), Config.STOCK_INFO_REFRESH_WORKERS)) as pool:
+                    fetched = list(pool.map(fetch, misses))
+                
+                for symbol, raw in zip(misses, fetched):
+                    if raw:
+                        stock = DataService._save_stock_info(symbol, raw)
+                        infos[symbol] = stock.to_info()
+                db.session.commit()
             
-            return {
-                'symbol': symbol,
-                'name': info.get('longName', symbol),
-                'sector': info.get('sector', 'N/A'),
-                'industry': info.get('industry', 'N/A'),
-                'description': info.get('longBusinessSummary', ''),
-                'market_cap': info.get('marketCap', 0),
-                'pe_ratio': info.get('trailingPE'),
-                'current_price': info.get('currentPrice'),
-                'previous_close': info.get('previousClose'),
-                'day_high': info.get('dayHigh'),
-                'day_low': info.get('dayLow'),
-                'volume': info.get('volume'),
-                '52_week_high': info.get('fiftyTwoWeekHigh'),
-                '52_week_low': info.get('fiftyTwoWeekLow'),
-                'beta': info.get('beta')
-            }
+            return {s: infos[s] for s in symbols if s in infos}
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error fetching stock info for {symbols}: {str(e)}")
+            return {}
+    
+    @staticmethod
+    def _fetch_stock_info_upstream(symbol):
+        """Raw provider info dict, or None"""
+        try:
+            info = get_provider().info(symbol)
+            return info or None
         except Exception as e:
             print(f"Error fetching {symbol}: {str(e)}")
             return None
     
+    @staticmethod
+    def _stock_values(symbol, raw):
+        """Stock column values for a raw provider info dict"""
+        values = {column: raw.get(key) for column, key in STOCK_INFO_FIELDS.items()}
+        values['company_name'] = values['company_name'] or raw.get('shortName') or symbol
+        values['description'] = values['description'] or ''
+        values['last_updated'] = datetime.utcnow()
+        return values
+    
+    @staticmethod
+    def _apply_stock_info(stock, raw):
+        for column, value in DataService._stock_values(stock.symbol, raw).items():
+            setattr(stock, column, value)
+        return stock
+    
+    @staticmethod
+    def _save_stock_info(symbol, raw):
+        """
+        Upsert metadata into the stocks table (caller commits) and return the
+        stored row. Concurrent requests can both miss on a new symbol, so the
+        write must not fail when the other one inserted it first.
+        """
+        values = DataService._stock_values(symbol, raw)
+        if not DataService._upsert_on_conflict(Stock, [dict(values, symbol=symbol)], ['symbol'], values):
+            # Fallback (older SQLite, other dialects): insert in a savepoint, update on collision
+            try:
+                with db.session.begin_nested():
+                    stock = Stock.query.filter_by(symbol=symbol).first()
+                    if stock is None:
+                        stock = Stock(symbol=symbol)
+                        db.session.add(stock)
+                    DataService._apply_stock_info(stock, raw)
+            except IntegrityError:
+                DataService._apply_stock_info(Stock.query.filter_by(symbol=symbol).one(), raw)
+                db.session.flush()
+        
+        return db.session.execute(
+            select(Stock).where(Stock.symbol == symbol).execution_options(populate_existing=True)
+        ).scalar_one()
+    
+    @staticmethod
+    def _schedule_info_refresh(symbol):
+        """Refresh one stale row on the background pool (deduplicated per symbol)"""
+        with _info_lock:
+            if symbol in _info_refreshing:
+                return
+            _info_refreshing.add(symbol)
+        _info_refresh_pool.submit(DataService._refresh_stock_info, current_app._get_current_object(), symbol)
+    
+    @staticmethod
+    def _refresh_stock_info(app, symbol):
+        try:
+            raw = info_flight.do(symbol, lambda: DataService._fetch_stock_info_upstream(symbol))
+            if raw:
+                with app.app_context():
+                    DataService._save_stock_info(symbol, raw)
+                    db.session.commit()
+                with _info_lock:
+                    _info_stats['refreshes'] += 1
+        except Exception as e:
+            print(f"Error refreshing stock info for {symbol}: {str(e)}")
+        finally:
+            with _info_lock:
+                _info_refreshing.discard(symbol)
+    
+    @staticmethod
+    def stock_info_cache_stats():
+        """Fresh/stale/miss counters for the stocks-table metadata cache"""
+        with _info_lock:
+            return dict(
+                _info_stats,
+                coalesced=info_flight.coalesced,
+                refreshing=len(_info_refreshing),
+            )
+    
     @staticmethod
     def fetch_historical_data(symbol, period='1y'):
         """Fetch historical price data"""
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
-            
-            if hist.empty:
+            hist = DataService.get_price_frame(symbol, period=period)
+            if hist is None or hist.empty:
                 return None
             
-            data = []
-            for date, row in hist.iterrows():
-                data.append({
-                    'date': date.strftime('%Y-%m-%d'),
-                    'open': float(row['Open']),
-                    'high': float(row['High']),
-                    'low': float(row['Low']),
-                    'close': float(row['Close']),
-                    'volume': int(row['Volume'])
-                })
-            
-            return data
+            return ohlcv_records(hist)
         except Exception as e:
             print(f"Error fetching historical data for {symbol}: {str(e)}")
             return None
     
+    @staticmethod
+    def get_price_frame(symbol, period='1y'):
+        """
+        Daily OHLCV DataFrame (yfinance column names) served from the local
+        price store. Only ranges the store has not verified go upstream, plus
+        the newest stored bar, which detects split/dividend re-adjustments.
+        """
+        try:
+            symbol = symbol.upper()
+            end = last_session()
+            start = period_start(period, end)
+            
+            if not price_store.has(symbol):
+                DataService._hydrate_price_store(symbol)
+            
+            # A re-adjusted history drops the stored bars, so re-plan once after it
+            for _ in range(2):
+                readjusted = False
+                for gap_start, gap_end in price_store.missing_ranges(symbol, start, end):
+                    hist = DataService._download_daily(symbol, gap_start, gap_end)
+                    readjusted = price_store.write(symbol, hist, gap_start, gap_end) or readjusted
+                if not readjusted:
+                    break
+            
+            return price_store.read_frame(symbol, start, end)
+        except Exception as e:
+            print(f"Error reading price history for {symbol}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def get_intraday_frame(symbol, interval, period='1d'):
+        """
+        Intraday OHLCV bars, derived from the cached base interval when a
+        cache tier covers the request, otherwise fetched upstream as-is.
+        """
+        hist = intraday_cache.bars(symbol, interval, period)
+        if hist is None:
+            hist = get_provider().history(symbol, period=period, interval=interval)
+        return hist
+    
+    @staticmethod
+    def intraday_cache_stats():
+        return intraday_cache.stats()
+    
+    @staticmethod
+    def _download_daily(symbol, start, end):
+        """Fetch daily bars for [start, end] upstream (start=None means full history)"""
+        provider = get_provider()
+        if start is None:
+            hist = provider.history(symbol, period='max')
+        else:
+            hist = provider.history(symbol, start=start, end=end + timedelta(days=1))
+        return DataService._trim_to(hist, end)
+    
+    @staticmethod
+    def _trim_to(hist, end):
+        """Drop bars after `end` (e.g. today's unfinished session)"""
+        if hist.empty:
+            return hist
+        hist_dates = hist.index.tz_localize(None) if hist.index.tz is not None else hist.index
+        return hist[hist_dates.date <= end]
+    
+    @staticmethod
+    def fetch_history_batch(symbols, start, end, batch_size=None, max_workers=None, stats=None):
+        """
+        Download daily bars for many symbols over one [start, end] range.
+        Symbols are grouped into batch_size-sized provider batch requests, with
+        up to max_workers batches in flight. Returns {symbol: DataFrame} for symbols
+        that returned bars. stats['batches'] counts the batch requests that completed.
+        """
+        batch_size = batch_size or Config.PRICE_FETCH_BATCH_SIZE
+        max_workers = max_workers or Config.PRICE_FETCH_WORKERS
+        symbols = [s.upper() for s in symbols]
+        batches = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+        
+        provider = get_provider()
+        
+        def download(batch):
+            if start is None:
+                frames = provider.batch_history(batch, period='max')
+            else:
+                frames = provider.batch_history(batch, start=start, end=end + timedelta(days=1))
+            if stats is not None:
+                with stats_lock:
+                    stats['batches'] = stats.get('batches', 0) + 1
+            frames = {symbol: DataService._trim_to(hist, end) for symbol, hist in frames.items()}
+            return {symbol: hist for symbol, hist in frames.items() if not hist.empty}
+        
+        stats_lock = threading.Lock()
+        frames = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batches)) or 1) as pool:
+            for batch_frames in pool.map(download, batches):
+                frames.update(batch_frames)
+        return frames
+    
+    @staticmethod
+    def _hydrate_price_store(symbol):
+        """
+        Seed the price store from bars already in the stock_prices table.
+        The table can have holes from sporadic ingests, so only the contiguous
+        tail after the last gap is marked verified; older bars are kept but
+        re-fetched through missing_ranges.
+        """
+        if not has_app_context():
+            return
+        
+        rows = db.session.query(
+            StockPrice.date, StockPrice.open, StockPrice.high,
+            StockPrice.low, StockPrice.close, StockPrice.volume
+        ).join(Stock).filter(Stock.symbol == symbol).order_by(StockPrice.date).all()
+        if not rows:
+            return
+        
+        hist = pd.DataFrame.from_records(rows, columns=['Date', *FRAME_COLUMNS])
+        hist = hist.set_index(pd.DatetimeIndex(hist.pop('Date')))
+        
+        gaps = DataService._find_gaps(hist.index.values.astype('datetime64[D]'))
+        start = gaps[-1][1] + timedelta(days=1) if gaps else rows[0].date
+        price_store.write(symbol, hist, start, rows[-1].date)
+    
     @staticmethod
     def store_stock_in_db(symbol):
         """Store stock info in database"""
@@ -72,21 +343,9 @@ class DataService:
             if stock:
                 return stock
             
-            info = DataService.fetch_stock_info(symbol)
-            if not info:
+            if not DataService.fetch_stock_info(symbol):
                 return None
-            
-            stock = Stock(
-                symbol=symbol,
-                company_name=info['name'],
-                sector=info.get('sector'),
-                industry=info.get('industry'),
-                market_cap=info.get('market_cap')
-            )
-            
-            db.session.add(stock)
-            db.session.commit()
-            return stock
+            return Stock.query.filter_by(symbol=symbol).first()
         except Exception as e:
             db.session.rollback()
             print(f"Error storing {symbol} in DB: {str(e)}")
@@ -94,82 +353,302 @@ class DataService:
     
     @staticmethod
     def store_price_data(symbol, days=30):
-        """Store historical price data in database"""
+        """
+        Store historical price data in database.
+        Returns {'inserted', 'updated', 'skipped'} row counts, or False on failure.
+        """
         try:
             stock = DataService.store_stock_in_db(symbol)
             if not stock:
                 return False
             
-            hist_data = DataService.fetch_historical_data(symbol, period=f'{days}d')
-            if not hist_data:
+            hist = DataService.get_price_frame(symbol, period=f'{days}d')
+            if hist is None or hist.empty:
                 return False
             
-            for day_data in hist_data:
-                date = datetime.strptime(day_data['date'], '%Y-%m-%d').date()
-                existing = StockPrice.query.filter_by(
-                    stock_id=stock.id,
-                    date=date
-                ).first()
-                if existing:
-                    continue
-                
-                price = StockPrice(
-                    stock_id=stock.id,
-                    date=date,
-                    open=day_data['open'],
-                    high=day_data['high'],
-                    low=day_data['low'],
-                    close=day_data['close'],
-                    volume=day_data['volume']
-                )
-                db.session.add(price)
-            
-            db.session.commit()
-            return True
+            return DataService.bulk_store_prices(stock.id, hist)
         except Exception as e:
             db.session.rollback()
             print(f"Error storing price data for {symbol}: {str(e)}")
             return False
     
     @staticmethod
-    def get_real_time_price(symbol):
-        """Get current real-time price"""
+    def bulk_store_prices(stock_id, hist, batch_size=None):
+        """
+        Idempotent set-based upsert of a yfinance-shaped OHLCV frame into
+        stock_prices. Each batch costs one SELECT to classify rows and one
+        INSERT ... ON CONFLICT (or bulk INSERT + bulk UPDATE on dialects
+        without it) for the rows that are new or changed.
+        """
+        batch_size = batch_size or Config.PRICE_UPSERT_BATCH_SIZE
+        block = frame_to_block(hist)
+        dates = block_dates(block).astype(date)
+        values = block[DATE + 1:].T.tolist()
+        
+        stats = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        order = block[DATE].argsort(kind='stable')
+        
         try:
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period='1d')
-            if data.empty:
-                return None
-            return float(data['Close'].iloc[-1])
-        except Exception as e:
-            print(f"Error getting real-time price for {symbol}: {str(e)}")
-            return None
+            for lo in range(0, len(order), batch_size):
+                batch = order[lo:lo + batch_size]
+                batch_dates = dates[batch]
+                existing = {
+                    row.date: row for row in db.session.execute(
+                        select(StockPrice.id, StockPrice.date, *[getattr(StockPrice, c) for c in PRICE_VALUE_COLUMNS])
+                        .where(StockPrice.stock_id == stock_id)
+                        .where(StockPrice.date.between(batch_dates.min(), batch_dates.max()))
+                    )
+                }
+                
+                new_rows, changed_rows = [], []
+                for i in batch:
+                    row = dict(zip(PRICE_VALUE_COLUMNS, values[i]), stock_id=stock_id, date=dates[i])
+                    row['volume'] = int(row['volume'])
+                    current = existing.get(dates[i])
+                    if current is None:
+                        new_rows.append(row)
+                    elif tuple(current[2:]) != tuple(row[c] for c in PRICE_VALUE_COLUMNS):
+                        changed_rows.append(dict(row, id=current.id))
+                    else:
+                        stats['skipped'] += 1
+                
+                DataService._upsert_price_rows(new_rows, changed_rows)
+                db.session.commit()
+                stats['inserted'] += len(new_rows)
+                stats['updated'] += len(changed_rows)
+            
+            return stats
+        except Exception:
+            db.session.rollback()
+            raise
+    
+    @staticmethod
+    def _upsert_price_rows(new_rows, changed_rows):
+        """Write classified rows with ON CONFLICT where supported, else bulk insert/update"""
+        rows = new_rows + [{k: v for k, v in r.items() if k != 'id'} for r in changed_rows]
+        if not rows:
+            return
+        
+        if DataService._upsert_on_conflict(StockPrice, rows, ['stock_id', 'date'], PRICE_VALUE_COLUMNS):
+            return
+        
+        # Fallback (older SQLite, other dialects): executemany insert + update by primary key
+        if new_rows:
+            db.session.execute(insert(StockPrice), new_rows)
+        if changed_rows:
+            db.session.execute(update(StockPrice), changed_rows)
     
     @staticmethod
-    def search_stocks(query):
-        """Search for stocks (simple implementation)"""
-        popular_stocks = {
-            'AAPL': 'Apple Inc.',
-            'MSFT': 'Microsoft Corporation',
-            'GOOGL': 'Alphabet Inc.',
-            'AMZN': 'Amazon.com Inc.',
-            'TSLA': 'Tesla, Inc.',
-            'META': 'Meta Platforms Inc.',
-            'NVDA': 'NVIDIA Corporation',
-            'AMD': 'Advanced Micro Devices',
-            'NFLX': 'Netflix Inc.',
-            'DIS': 'The Walt Disney Company',
-            'JPM': 'JPMorgan Chase & Co.',
-            'BAC': 'Bank of America Corp',
-            'WMT': 'Walmart Inc.',
-            'V': 'Visa Inc.',
-            'MA': 'Mastercard Inc.'
+    def _upsert_on_conflict(model, rows, index_elements, update_columns):
+        """
+        INSERT ... ON CONFLICT (index_elements) DO UPDATE update_columns for
+        `rows` where the dialect supports it (PostgreSQL, SQLite >= 3.24).
+        Returns False without writing anything otherwise, so the caller can
+        take its own fallback.
+        """
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            dialect_insert = postgresql.insert
+        elif dialect == 'sqlite' and sqlite3.sqlite_version_info >= (3, 24):
+            dialect_insert = sqlite.insert
+        else:
+            return False
+        
+        stmt = dialect_insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={c: stmt.excluded[c] for c in update_columns},
+        )
+        db.session.execute(stmt, rows)
+        return True
+    
+    @staticmethod
+    def refresh_price_history(symbols):
+        """
+        Incremental refresh of stock_prices: download only the bars after each
+        symbol's last stored date plus any multi-session gaps found in the
+        lookback window. Symbols already holding the last closed session are
+        skipped without an upstream call; symbols sharing a range are fetched
+        together through fetch_history_batch. Every gap range upstream answers
+        is recorded in checked_price_ranges, so gaps it cannot fill (holidays,
+        halts) are not requested again.
+        """
+        session = last_session()
+        stock_ids = DataService._ensure_stocks(symbols)
+        plan, up_to_date, known_gaps = DataService.plan_price_refresh(stock_ids, session)
+        
+        report = {
+            'symbols': len(stock_ids),
+            'up_to_date': len(up_to_date),
+            'ranges_fetched': 0,
+            'batches': 0,
+            'gaps_backfilled': 0,
+            'gaps_known': known_gaps,
+            'gaps_empty': 0,
+            'inserted': 0,
+            'updated': 0,
+            'skipped': 0,
+            'failed': [],
         }
         
-        query = query.upper()
-        results = []
+        # Symbols sharing a range (typically every symbol's tail) share batch downloads
+        groups = defaultdict(list)
+        for symbol, start, end, is_gap in plan:
+            groups[(start, end, is_gap)].append(symbol)
         
-        for symbol, name in popular_stocks.items():
-            if query in symbol or query.lower() in name.lower():
-                results.append({'symbol': symbol, 'name': name})
+        for (start, end, is_gap), group in groups.items():
+            fetch_stats = {}
+            try:
+                frames = DataService.fetch_history_batch(group, start, end, stats=fetch_stats)
+            except Exception as e:
+                print(f"Error downloading {len(group)} symbols {start}..{end}: {str(e)}")
+                report['failed'].extend(group)
+                continue
+            finally:
+                report['batches'] += fetch_stats.get('batches', 0)
+            
+            report['ranges_fetched'] += len(group)
+            # Symbols whose answer is settled: empty ones, plus those stored below
+            answered = set(group) - set(frames)
+            for symbol, hist in frames.items():
+                try:
+                    stats = DataService.bulk_store_prices(stock_ids[symbol], hist)
+                    price_store.write(symbol, hist, start, end)
+                    for key, value in stats.items():
+                        report[key] += value
+                    if is_gap:
+                        report['gaps_backfilled'] += 1
+                    answered.add(symbol)
+                except Exception as e:
+                    print(f"Error storing {symbol} {start}..{end}: {str(e)}")
+                    report['failed'].append(symbol)
+            
+            if is_gap:
+                report['gaps_empty'] += len(group) - len(frames)
+                if answered:
+                    DataService._record_checked_ranges([stock_ids[symbol] for symbol in answered], start, end)
+        
+        return report
+    
+    @staticmethod
+    def plan_price_refresh(stock_ids, session):
+        """
+        Work out which (symbol, start, end, is_gap) ranges need downloading.
+        Gaps inside a range recorded in checked_price_ranges are left out.
+        Returns (plan, up_to_date_symbols, number of gaps left out).
+        """
+        ids = list(stock_ids.values())
+        symbol_for = {stock_id: symbol for symbol, stock_id in stock_ids.items()}
         
-        return results[:10]
+        last_dates = dict(db.session.execute(
+            select(StockPrice.stock_id, func.max(StockPrice.date))
+            .where(StockPrice.stock_id.in_(ids))
+            .group_by(StockPrice.stock_id)
+        ).all())
+        
+        window_start = session - timedelta(days=Config.PRICE_GAP_LOOKBACK_DAYS)
+        rows = db.session.execute(
+            select(StockPrice.stock_id, StockPrice.date)
+            .where(StockPrice.stock_id.in_(ids))
+            .where(StockPrice.date >= window_start)
+            .order_by(StockPrice.stock_id, StockPrice.date)
+        ).all()
+        
+        checked = defaultdict(list)
+        for row in db.session.execute(
+            select(CheckedPriceRange.stock_id, CheckedPriceRange.start_date, CheckedPriceRange.end_date)
+            .where(CheckedPriceRange.stock_id.in_(ids))
+            .where(CheckedPriceRange.end_date >= window_start)
+        ):
+            checked[row.stock_id].append((row.start_date, row.end_date))
+        
+        plan, up_to_date, known_gaps = [], [], 0
+        for stock_id, stock_rows in groupby(rows, key=lambda r: r.stock_id):
+            dates = np.array([r.date for r in stock_rows], dtype='datetime64[D]')
+            for gap_start, gap_end in DataService._find_gaps(dates):
+                if any(lo <= gap_start and gap_end <= hi for lo, hi in checked[stock_id]):
+                    known_gaps += 1
+                    continue
+                plan.append((symbol_for[stock_id], gap_start, gap_end, True))
+        
+        for symbol, stock_id in stock_ids.items():
+            last = last_dates.get(stock_id)
+            if last is None:
+                plan.append((symbol, period_start(Config.DEFAULT_STOCK_PERIOD, session), session, False))
+            elif np.busday_count(last + timedelta(days=1), session + timedelta(days=1)) == 0:
+                up_to_date.append(symbol)
+            else:
+                plan.append((symbol, last + timedelta(days=1), session, False))
+        
+        return plan, up_to_date, known_gaps
+    
+    @staticmethod
+    def _record_checked_ranges(stock_ids, start, end):
+        """Remember that upstream was asked for [start, end] for these stocks"""
+        rows = [
+            {'stock_id': stock_id, 'start_date': start, 'end_date': end, 'checked_at': datetime.utcnow()}
+            for stock_id in stock_ids
+        ]
+        if not DataService._upsert_on_conflict(
+            CheckedPriceRange, rows, ['stock_id', 'start_date', 'end_date'], ['checked_at']
+        ):
+            # Planning skips recorded ranges, so the same range is not inserted twice
+            db.session.execute(insert(CheckedPriceRange), rows)
+        db.session.commit()
+    
+    @staticmethod
+    def _find_gaps(dates):
+        """Runs of >= PRICE_GAP_MIN_SESSIONS missing weekdays between sorted stored dates"""
+        if len(dates) < 2:
+            return []
+        missing = np.busday_count(dates[:-1] + 1, dates[1:])
+        gap_idx = np.nonzero(missing >= Config.PRICE_GAP_MIN_SESSIONS)[0]
+        return [
+            ((dates[i] + 1).astype(date), (dates[i + 1] - 1).astype(date))
+            for i in gap_idx
+        ]
+    
+    @staticmethod
+    def _ensure_stocks(symbols):
+        """Map symbols to stock ids, creating bare Stock rows for unknown symbols"""
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        query = select(Stock.symbol, Stock.id).where(Stock.symbol.in_(symbols))
+        found = dict(db.session.execute(query).all())
+        
+        missing = [s for s in symbols if s not in found]
+        if missing:
+            # Metadata (and last_updated) is filled in lazily by fetch_stock_infos
+            db.session.add_all([Stock(symbol=s, company_name=s, last_updated=None) for s in missing])
+            db.session.commit()
+            found = dict(db.session.execute(query).all())
+        
+        return found
+    
+    @staticmethod
+    def get_real_time_price(symbol):
+        """Get current real-time price (cached for QUOTE_CACHE_TTL_SECONDS)"""
+        try:
+            symbol = symbol.upper()
+            return quote_cache.get(symbol, lambda: DataService._fetch_quote(symbol))
+        except Exception as e:
+            print(f"Error getting real-time price for {symbol}: {str(e)}")
+            return None
+    
+    @staticmethod
+    def _fetch_quote(symbol):
+        """Latest price straight from the market data provider"""
+        return get_provider().quote(symbol)
+    
+    @staticmethod
+    def quote_cache_stats():
+        """Hit/miss/coalesced/eviction counters for the quote cache"""
+        return quote_cache.stats()
+    
+    @staticmethod
+    def search_stocks(query, limit=10):
+        """Ranked symbol/company-name search over the listing universe"""
+        return symbol_index.search(query, limit)
+    
+    @staticmethod
+    def search_index_stats():
+        return symbol_index.stats()
@@ -0,0 +1,164 @@
+"""
+Feature Store - per-symbol feature matrix, computed once per bar
+
+The superset of model features (ml_models.features.FEATURE_COLUMNS) is
+computed once per (symbol, last bar) and kept as one ``.npy`` file holding a
+(1 + k, n) float32 block: a date row (days since the epoch, exact in float32)
+followed by one contiguous row per feature. Files are opened with
+``mmap_mode='r'``; a model's columns are a contiguous run of rows, so its
+(n, m) feature matrix is a transposed slice of the mapped block.
+
+For each newest bar the store keeps the longest history it has been given:
+shorter windows through the same bar (a 6mo prediction next to a 2y fit and
+a 5y panel) are served as column slices instead of replacing the block.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config.config import Config
+from ml_models.features import FEATURE_COLUMNS, FEATURE_WARMUP, compute_features
+
+
+FEATURE_ROWS = {name: row for row, name in enumerate(FEATURE_COLUMNS, start=1)}
+WARMUP_ROWS = [(FEATURE_ROWS[name], FEATURE_WARMUP[name]) for name in FEATURE_COLUMNS]
+
+
+def _days(index):
+    """DatetimeIndex as integer days since the epoch"""
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    return index.values.astype('datetime64[D]').astype(np.int64)
+
+
+def _frame_key(frame):
+    """What the stored features were computed from: the newest bar's date, close and volume"""
+    return [int(_days(frame.index[-1:])[0]), float(frame['close'].iloc[-1]), float(frame['volume'].iloc[-1])]
+
+
+class FeatureStore:
+    """Memory-mapped per-symbol float32 feature matrices"""
+
+    def __init__(self, root=None):
+        self.root = root or Config.FEATURE_STORE_DIR
+        self._lock = threading.Lock()
+        self._maps = {}
+        self._stats = {'hits': 0, 'computed': 0}
+
+    def _path(self, symbol, ext):
+        return os.path.join(self.root, f"{symbol.upper().replace(os.sep, '_')}.{ext}")
+
+    def _load(self, symbol):
+        """(block, meta) for a symbol, reusing the map while the file is unchanged"""
+        path = self._path(symbol, 'npy')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        cached = self._maps.get(symbol)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        try:
+            with open(self._path(symbol, 'json')) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        entry = (np.load(path, mmap_mode='r'), meta)
+        self._maps[symbol] = (mtime, entry)
+        return entry
+
+    @staticmethod
+    def _rows(block, frame):
+        """
+        Slice of block columns matching frame's dates, or None if they don't
+        line up. A slice that starts after the block's first bar gets its
+        warm-up rows reset to NaN, as if the features were computed on frame.
+        """
+        dates = block[0]
+        days = _days(frame.index)
+        lo = int(np.searchsorted(dates, days[0]))
+        hi = lo + len(days)
+        if hi > len(dates) or dates[lo] != days[0] or dates[hi - 1] != days[-1]:
+            return None
+        if lo == 0:
+            return block[:, lo:hi]
+
+        rows = np.array(block[:, lo:hi])
+        for row, warmup in WARMUP_ROWS:
+            rows[row, :warmup] = np.nan
+        return rows
+
+    def block(self, symbol, frame):
+        """
+        (1 + k, len(frame)) float32 block aligned with `frame` (lowercase
+        OHLCV, as from MLService.load_history). Served from the stored block
+        when it was computed through the same newest bar and covers frame's
+        dates (a copy when frame starts later, see _rows); otherwise
+        recomputed from `frame`, and stored unless a longer history through
+        the same bar already is.
+        """
+        symbol = symbol.upper()
+        key = _frame_key(frame)
+
+        entry = self._load(symbol)
+        if entry is not None and entry[1].get('key') == key and entry[1].get('columns') == FEATURE_COLUMNS:
+            rows = self._rows(entry[0], frame)
+            if rows is not None:
+                with self._lock:
+                    self._stats['hits'] += 1
+                return rows
+
+        block = np.empty((1 + len(FEATURE_COLUMNS), len(frame)), dtype=np.float32)
+        block[0] = _days(frame.index)
+        block[1:] = compute_features(frame)[FEATURE_COLUMNS].to_numpy(dtype=np.float32).T
+
+        with self._lock:
+            self._stats['computed'] += 1
+            entry = self._load(symbol)
+            if (entry is not None and entry[1].get('key') == key and entry[1].get('columns') == FEATURE_COLUMNS
+                    and entry[0][0, 0] < block[0, 0]):
+                return block
+
+            os.makedirs(self.root, exist_ok=True)
+            path = self._path(symbol, 'npy')
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.save(f, block)
+            os.replace(tmp_path, path)
+
+            meta_path = self._path(symbol, 'json')
+            tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'key': key, 'columns': FEATURE_COLUMNS}, f)
+            os.replace(tmp_path, meta_path)
+            self._maps.pop(symbol, None)
+        return block
+
+    def matrix(self, symbol, frame, columns):
+        """
+        (len(frame), len(columns)) float32 features aligned with frame's
+        rows. A read-only view of the mapped block when `columns` is a
+        contiguous run of FEATURE_COLUMNS (every model's set is) and frame
+        starts at the block's first bar.
+        """
+        block = self.block(symbol, frame)
+        rows = [FEATURE_ROWS[name] for name in columns]
+        if rows == list(range(rows[0], rows[0] + len(rows))):
+            return block[rows[0]:rows[-1] + 1].T
+        return block[rows].T
+
+    def frame(self, symbol, frame, columns):
+        """matrix() as a DataFrame on frame's index"""
+        return pd.DataFrame(self.matrix(symbol, frame, columns), index=frame.index, columns=columns, copy=False)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, mapped=len(self._maps))
+
+
+feature_store = FeatureStore()
@@ -0,0 +1,237 @@
+"""
+Intraday Cache - minute bars per symbol, coarser intervals derived locally
+
+Each configured tier keeps one base interval (1m, 5m, ...) for a number of
+recent sessions. A chart request is served from the finest tier that covers
+its period and divides its interval; everything coarser than the base is
+aggregated here with ``reduceat`` over session-anchored buckets, so one
+upstream fetch per symbol serves 1m/5m/15m/1h alike. Entries are refreshed
+incrementally (only the newest session is re-fetched) after
+INTRADAY_REFRESH_SECONDS.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from config.config import Config
+from .market_data import INTRADAY_INTERVALS, get_provider
+from .price_store import FRAME_COLUMNS, last_session, period_start
+from .quote_cache import SingleFlight
+
+
+INTERVAL_MINUTES = {interval: int(freq[:-3]) for interval, freq in INTRADAY_INTERVALS.items()}
+SESSION_OPEN_MINUTES = 9 * 60 + 30  # bars are anchored at the 09:30 exchange-time open
+
+_DAY_MS = 86_400_000
+_MINUTE_MS = 60_000
+
+
+def resample_ohlcv(frame, minutes, anchor_minutes=SESSION_OPEN_MINUTES):
+    """
+    Aggregate sorted intraday bars into `minutes`-wide buckets anchored at the
+    session open (exchange wall-clock time), like yfinance's own intraday bars.
+    """
+    if frame.empty:
+        return frame
+
+    index = frame.index
+    tz = index.tz
+    wall = index.tz_localize(None) if tz is not None else index
+    ts = wall.as_unit('ms').asi8
+
+    step = minutes * _MINUTE_MS
+    origin = ts // _DAY_MS * _DAY_MS + anchor_minutes * _MINUTE_MS
+    buckets = origin + (ts - origin) // step * step
+
+    starts = np.flatnonzero(np.concatenate([[True], buckets[1:] != buckets[:-1]]))
+    ends = np.append(starts[1:], len(ts)) - 1
+
+    out_index = pd.DatetimeIndex(buckets[starts].astype('datetime64[ms]'), name=index.name)
+    if tz is not None:
+        out_index = out_index.tz_localize(tz)
+
+    return pd.DataFrame({
+        'Open': frame['Open'].to_numpy(dtype=np.float64)[starts],
+        'High': np.maximum.reduceat(frame['High'].to_numpy(dtype=np.float64), starts),
+        'Low': np.minimum.reduceat(frame['Low'].to_numpy(dtype=np.float64), starts),
+        'Close': frame['Close'].to_numpy(dtype=np.float64)[ends],
+        'Volume': np.add.reduceat(frame['Volume'].fillna(0).to_numpy(dtype=np.int64), starts),
+    }, index=out_index)
+
+
+def _session_days(frame):
+    """Exchange-local session date of each bar as datetime64[D]"""
+    index = frame.index
+    wall = index.tz_localize(None) if index.tz is not None else index
+    return wall.values.astype('datetime64[D]')
+
+
+def _last_sessions(frame, sessions):
+    """Bars belonging to the newest `sessions` trading days"""
+    if frame.empty:
+        return frame
+    days = _session_days(frame)
+    unique = np.unique(days)
+    if len(unique) <= sessions:
+        return frame
+    return frame[days >= unique[-sessions]]
+
+
+def _period_sessions(period):
+    """Trading sessions a yfinance-style period spans, ending today"""
+    period = period.lower()
+    if period.endswith('d') and period[:-1].isdigit():
+        return int(period[:-1])
+    end = last_session()
+    start = period_start(period, end)
+    if start is None:
+        return None
+    return int(np.busday_count(start, end)) + 1
+
+
+class IntradayCache:
+    """LRU of per-(symbol, base interval) intraday frames"""
+
+    def __init__(self, tiers=None, refresh_seconds=None, max_entries=None):
+        # ((base interval, sessions kept), ...), finest first
+        self.tiers = tuple(tiers or Config.INTRADAY_TIERS)
+        self.refresh_seconds = Config.INTRADAY_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.max_entries = max_entries or Config.INTRADAY_CACHE_MAX_ENTRIES
+        self._entries = OrderedDict()  # (symbol, base) -> (fetched_at, frame)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'fetches': 0, 'refreshes': 0, 'evictions': 0, 'derived': 0, 'upstream_only': 0}
+
+    def tier_for(self, interval, period):
+        """(base, sessions) of the finest tier that can serve the request, or None"""
+        minutes = INTERVAL_MINUTES.get(interval)
+        if minutes is None:
+            return None
+        try:
+            needed = _period_sessions(period)
+        except ValueError:
+            return None
+        if needed is None:
+            return None
+
+        for base, sessions in self.tiers:
+            if minutes % INTERVAL_MINUTES[base] == 0 and needed <= sessions:
+                return base, sessions
+        return None
+
+    def bars(self, symbol, interval, period='1d'):
+        """
+        OHLCV bars for `interval` over `period`, or None when no tier covers
+        the request (the caller should go upstream directly).
+        """
+        symbol = symbol.upper()
+        tier = self.tier_for(interval, period)
+        if tier is None:
+            with self._lock:
+                self._stats['upstream_only'] += 1
+            return None
+
+        base, sessions = tier
+        frame = self._base_frame(symbol, base, sessions)
+        if frame is None or frame.empty:
+            return frame
+
+        period = period.lower()
+        if period.endswith('d') and period[:-1].isdigit():
+            frame = _last_sessions(frame, int(period[:-1]))
+        else:
+            start = period_start(period, _session_days(frame)[-1].astype(date))
+            frame = frame[_session_days(frame) >= np.datetime64(start, 'D')]
+
+        if INTERVAL_MINUTES[interval] == INTERVAL_MINUTES[base]:
+            return frame
+        with self._lock:
+            self._stats['derived'] += 1
+        return resample_ohlcv(frame, INTERVAL_MINUTES[interval])
+
+    def _base_frame(self, symbol, base, sessions):
+        key = (symbol, base)
+        with self._lock:
+            entry, fresh = self._lookup(key)
+        if fresh:
+            return entry[1]
+
+        def load():
+            # Re-check: a leader may have refreshed the entry since our lookup
+            with self._lock:
+                entry, fresh = self._lookup(key)
+            if fresh:
+                return entry[1]
+            try:
+                frame = self._fetch(symbol, base, sessions, entry[1] if entry else None)
+            except Exception as e:
+                print(f"Error fetching {base} bars for {symbol}: {str(e)}")
+                # Serve the last known bars rather than failing the chart
+                return entry[1] if entry else None
+            with self._lock:
+                self._put(key, frame)
+            return frame
+
+        return self._flight.do(key, load)
+
+    def _lookup(self, key):
+        """(entry, fresh) for key; fresh entries count as hits (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        self._entries.move_to_end(key)
+        fresh = time.monotonic() - entry[0] < self.refresh_seconds
+        if fresh:
+            self._stats['hits'] += 1
+        return entry, fresh
+
+    def _fetch(self, symbol, base, sessions, cached):
+        provider = get_provider()
+        if cached is None or cached.empty:
+            with self._lock:
+                self._stats['fetches'] += 1
+            fetched = provider.history(symbol, period=f'{sessions}d', interval=base)
+            return _last_sessions(self._clean(fetched), sessions)
+
+        # Incremental: re-fetch from the newest cached session onwards
+        newest = _session_days(cached)[-1].astype(date)
+        behind = int(np.busday_count(newest, last_session())) + 1
+        with self._lock:
+            self._stats['refreshes'] += 1
+        fetched = self._clean(provider.history(symbol, period=f'{min(max(behind, 1), sessions)}d', interval=base))
+        if fetched.empty:
+            return cached
+
+        merged = pd.concat([cached[cached.index < fetched.index[0]], fetched])
+        merged = merged[~merged.index.duplicated(keep='last')]
+        return _last_sessions(merged, sessions)
+
+    @staticmethod
+    def _clean(frame):
+        if frame is None or frame.empty:
+            return pd.DataFrame(columns=list(FRAME_COLUMNS))
+        frame = frame[list(FRAME_COLUMNS)].dropna(subset=['Close'])
+        return frame.sort_index()
+
+    def _put(self, key, frame):
+        self._entries[key] = (time.monotonic(), frame)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                coalesced=self._flight.coalesced,
+                entries=len(self._entries),
+                bars=int(sum(len(frame) for _, frame in self._entries.values())),
+            )
+
+
+intraday_cache = IntradayCache()
@@ -0,0 +1,289 @@
+"""
+Market Data Providers - one interface for history, quotes, info and batch history
+
+YFinanceProvider talks to Yahoo Finance. FixtureProvider serves recorded CSVs
+or deterministic synthetic OHLCV from local files with optional injected
+latency, so hot paths can be benchmarked and load-tested without a network.
+All frames use yfinance's shape: DatetimeIndex plus Open/High/Low/Close/Volume.
+"""
+import json
+import os
+import threading
+import time
+import zlib
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from config.config import Config
+from .price_store import FRAME_COLUMNS, last_session, period_start
+
+
+INTRADAY_INTERVALS = {
+    '1m': '1min', '2m': '2min', '5m': '5min', '15m': '15min',
+    '30m': '30min', '60m': '60min', '90m': '90min', '1h': '60min',
+}
+DAILY_RESAMPLE = {'1wk': 'W-FRI', '1mo': 'MS'}
+OHLCV_AGG = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+class MarketDataProvider:
+    """Interface every market data source implements"""
+
+    name = 'base'
+
+    def history(self, symbol, period=None, interval='1d', start=None, end=None):
+        """OHLCV DataFrame; `end` is exclusive like yfinance. Empty frame when nothing is found"""
+        raise NotImplementedError
+
+    def batch_history(self, symbols, period=None, start=None, end=None):
+        """{symbol: daily OHLCV DataFrame} for the symbols that returned bars"""
+        raise NotImplementedError
+
+    def quote(self, symbol):
+        """Latest traded price, or None"""
+        raise NotImplementedError
+
+    def info(self, symbol):
+        """Company/quote metadata dict using yfinance `info` keys"""
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Yahoo Finance via yfinance"""
+
+    name = 'yfinance'
+
+    def history(self, symbol, period=None, interval='1d', start=None, end=None):
+        kwargs = {'interval': interval}
+        if start is not None:
+            kwargs.update(start=start, end=end)
+        else:
+            kwargs['period'] = period or '1mo'
+        return yf.Ticker(symbol).history(**kwargs)
+
+    def batch_history(self, symbols, period=None, start=None, end=None):
+        kwargs = {'start': start, 'end': end} if start is not None else {'period': period or 'max'}
+        wide = yf.download(
+            list(symbols), group_by='ticker', auto_adjust=True,
+            threads=False, progress=False, **kwargs
+        )
+        if wide is None or wide.empty:
+            return {}
+
+        frames = {}
+        for symbol in symbols:
+            if isinstance(wide.columns, pd.MultiIndex):
+                if symbol not in wide.columns.get_level_values(0):
+                    continue
+                hist = wide[symbol]
+            else:
+                hist = wide
+            hist = hist.dropna(subset=['Close'])
+            if not hist.empty:
+                frames[symbol] = hist[list(FRAME_COLUMNS)]
+        return frames
+
+    def quote(self, symbol):
+        data = yf.Ticker(symbol).history(period='1d')
+        if data.empty:
+            return None
+        return float(data['Close'].iloc[-1])
+
+    def info(self, symbol):
+        return yf.Ticker(symbol).info
+
+
+class FixtureProvider(MarketDataProvider):
+    """
+    Offline provider. Reads `<SYMBOL>.csv` (daily) and `<SYMBOL>_1m.csv`
+    (minute bars) and an optional `<SYMBOL>.json` info dict from `directory`;
+    symbols without recordings get a deterministic synthetic series seeded by
+    the symbol name. Every call sleeps `latency_ms` to mimic upstream latency.
+    """
+
+    name = 'fixture'
+    SYNTHETIC_START = '2000-01-03'
+    SESSION_MINUTES = 390
+
+    def __init__(self, directory, latency_ms=0.0):
+        self.directory = directory
+        self.latency_ms = latency_ms
+        self._daily = {}
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+
+    def _seed(self, symbol, *parts):
+        return [zlib.crc32(symbol.upper().encode()), *parts]
+
+    def _load_daily(self, symbol):
+        symbol = symbol.upper()
+        with self._lock:
+            hist = self._daily.get(symbol)
+            if hist is None:
+                path = os.path.join(self.directory, f'{symbol}.csv')
+                if os.path.exists(path):
+                    hist = pd.read_csv(path, index_col=0, parse_dates=True)[list(FRAME_COLUMNS)]
+                else:
+                    hist = self._synthetic_daily(symbol)
+                hist.index.name = 'Date'
+                self._daily[symbol] = hist
+        return hist
+
+    def _synthetic_daily(self, symbol):
+        """Geometric random walk; each column has its own stream so history is stable as days are added"""
+        dates = pd.bdate_range(self.SYNTHETIC_START, last_session(), name='Date')
+        n = len(dates)
+        seed = self._seed(symbol)
+        draw = lambda col: np.random.default_rng(seed + [col])
+
+        base = 20 + seed[0] % 480
+        close = base * np.exp(np.cumsum(draw(0).normal(0.0003, 0.018, n)))
+        open_ = close * (1 + draw(1).normal(0, 0.006, n))
+        high = np.maximum(open_, close) * (1 + np.abs(draw(2).normal(0, 0.008, n)))
+        low = np.minimum(open_, close) * (1 - np.abs(draw(3).normal(0, 0.008, n)))
+        volume = draw(4).integers(1_000_000, 50_000_000, n)
+
+        return pd.DataFrame(
+            {'Open': open_, 'High': high, 'Low': low, 'Close': close, 'Volume': volume},
+            index=dates,
+        )
+
+    def _minute_bars(self, symbol, sessions):
+        """Minute bars for the given session dates, bridged between each day's open and close"""
+        path = os.path.join(self.directory, f'{symbol.upper()}_1m.csv')
+        if os.path.exists(path):
+            bars = pd.read_csv(path, index_col=0, parse_dates=True)[list(FRAME_COLUMNS)]
+            return bars[np.isin(bars.index.normalize().date, [d.date() for d in sessions])]
+
+        daily = self._load_daily(symbol)
+        frames = []
+        steps = np.arange(1, self.SESSION_MINUTES + 1) / self.SESSION_MINUTES
+        for session in sessions:
+            if session not in daily.index:
+                continue
+            day = daily.loc[session]
+            rng = np.random.default_rng(self._seed(symbol, int(session.strftime('%Y%m%d'))))
+            walk = np.cumsum(rng.normal(0, 1, self.SESSION_MINUTES))
+            bridge = walk - steps * walk[-1]
+            span = (day['High'] - day['Low']) / 4
+            close = day['Open'] + (day['Close'] - day['Open']) * steps + bridge / (np.abs(bridge).max() or 1) * span
+            close = np.clip(close, day['Low'], day['High'])
+            open_ = np.concatenate([[day['Open']], close[:-1]])
+            index = pd.date_range(
+                session + pd.Timedelta(hours=9, minutes=30), periods=self.SESSION_MINUTES,
+                freq='1min', tz='America/New_York', name='Datetime',
+            )
+            frames.append(pd.DataFrame({
+                'Open': open_,
+                'High': np.maximum(open_, close),
+                'Low': np.minimum(open_, close),
+                'Close': close,
+                'Volume': rng.multinomial(int(day['Volume']), np.full(self.SESSION_MINUTES, 1 / self.SESSION_MINUTES)),
+            }, index=index))
+
+        return pd.concat(frames) if frames else pd.DataFrame(columns=list(FRAME_COLUMNS))
+
+    def _slice_daily(self, symbol, period=None, start=None, end=None):
+        hist = self._load_daily(symbol)
+        if hist.empty:
+            return hist
+        if start is not None:
+            stop = pd.Timestamp(end) - timedelta(days=1) if end is not None else None
+            return hist.loc[pd.Timestamp(start):stop]
+
+        period = period or '1mo'
+        if period.endswith('d') and period[:-1].isdigit():
+            return hist.iloc[-int(period[:-1]):]
+        first = period_start(period, hist.index[-1].date())
+        return hist if first is None else hist.loc[pd.Timestamp(first):]
+
+    def history(self, symbol, period=None, interval='1d', start=None, end=None):
+        self._wait()
+        daily = self._slice_daily(symbol, period, start, end)
+
+        if interval in INTRADAY_INTERVALS:
+            bars = self._minute_bars(symbol, daily.index)
+            if interval == '1m' or bars.empty:
+                return bars
+            return bars.resample(INTRADAY_INTERVALS[interval], origin='start').agg(OHLCV_AGG).dropna()
+        if interval in DAILY_RESAMPLE:
+            return daily.resample(DAILY_RESAMPLE[interval]).agg(OHLCV_AGG).dropna()
+        return daily.copy()
+
+    def batch_history(self, symbols, period=None, start=None, end=None):
+        self._wait()
+        frames = {}
+        for symbol in symbols:
+            hist = self._slice_daily(symbol, period or 'max', start, end)
+            if not hist.empty:
+                frames[symbol] = hist.copy()
+        return frames
+
+    def quote(self, symbol):
+        self._wait()
+        hist = self._load_daily(symbol)
+        return float(hist['Close'].iloc[-1]) if not hist.empty else None
+
+    def info(self, symbol):
+        self._wait()
+        symbol = symbol.upper()
+        path = os.path.join(self.directory, f'{symbol}.json')
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+
+        hist = self._load_daily(symbol)
+        if hist.empty:
+            return {}
+        last, prev = hist.iloc[-1], hist.iloc[-2] if len(hist) > 1 else hist.iloc[-1]
+        year = hist.iloc[-252:]
+        return {
+            'symbol': symbol,
+            'longName': f'{symbol} Fixture Corp.',
+            'sector': 'Technology',
+            'industry': 'Software',
+            'longBusinessSummary': f'Synthetic fixture data for {symbol}.',
+            'marketCap': int(last['Close'] * 1_000_000_000),
+            'trailingPE': 20.0,
+            'currentPrice': float(last['Close']),
+            'previousClose': float(prev['Close']),
+            'open': float(last['Open']),
+            'dayHigh': float(last['High']),
+            'dayLow': float(last['Low']),
+            'volume': int(last['Volume']),
+            'fiftyTwoWeekHigh': float(year['High'].max()),
+            'fiftyTwoWeekLow': float(year['Low'].min()),
+            'beta': 1.0,
+        }
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider():
+    """Process-wide provider selected by Config.MARKET_DATA_PROVIDER"""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                if Config.MARKET_DATA_PROVIDER == 'fixture':
+                    _provider = FixtureProvider(
+                        Config.MARKET_DATA_FIXTURE_DIR,
+                        latency_ms=Config.MARKET_DATA_FIXTURE_LATENCY_MS,
+                    )
+                else:
+                    _provider = YFinanceProvider()
+    return _provider
+
+
+def set_provider(provider):
+    """Swap the active provider (benchmarks, capacity tests)"""
+    global _provider
+    _provider = provider
@@ -2,6 +2,7 @@
 ML Service - Stock prediction using FREE ML models
 """
 import os
+import shutil
 from datetime import datetime, timedelta
 
 import numpy as np
@@ -10,46 +11,96 @@ import joblib
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import MinMaxScaler
 
+from config.config import Config
+from ml_models.ensemble import EnsembleModel
+from ml_models.features import MODEL_COLUMNS, compute_features
+from ml_models.flat_trees import FlatForest, flatten
+from ml_models.panel_model import PANEL_COLUMNS, PanelModel, panel_targets
+from ml_models.params import ensemble_params, load_tuned_params
+from .data_service import DataService
+from .feature_store import feature_store
+from .model_registry import model_registry
+from .price_store import price_store
+
 
 class MLService:
     """Service for ML predictions"""
 
     MODELS_DIR = 'ml_models/trained_models'
 
+    FEATURE_COLUMNS = MODEL_COLUMNS['rf']
+
     @staticmethod
-    def prepare_features(prices_df: pd.DataFrame) -> pd.DataFrame:
-        """Prepare technical features and target for ML model"""
-        df = prices_df.copy()
+    def load_history(symbol: str, period: str = Config.DEFAULT_STOCK_PERIOD):
+        """Daily OHLCV from the local price store with lowercase columns"""
+        hist = DataService.get_price_frame(symbol, period=period)
+        if hist is None or hist.empty:
+            return None
+        hist = hist.rename(columns=str.lower)
+        hist.index.name = 'date'
+        return hist
 
-        # Technical indicators
-        df['MA5'] = df['close'].rolling(window=5).mean()
-        df['MA10'] = df['close'].rolling(window=10).mean()
-        df['MA20'] = df['close'].rolling(window=20).mean()
-        df['MA50'] = df['close'].rolling(window=50).mean()
+    @staticmethod
+    def prepare_features(prices_df: pd.DataFrame, horizons: int = 1, with_target: bool = True,
+                         symbol: str = None) -> pd.DataFrame:
+        """
+        Prepare technical features and targets for ML model.
+
+        Targets are the closes 1..horizons days ahead (target_1, target_2, ...;
+        `target` is target_1). With with_target=False no targets are added, so
+        the latest bar keeps its feature row for inference. Features are
+        float32 either way; with a symbol they come from the shared feature
+        store (computed once per bar for every model) instead of being
+        recomputed here.
+        """
+        if symbol is not None:
+            features = feature_store.frame(symbol, prices_df, MLService.FEATURE_COLUMNS)
+        else:
+            features = compute_features(prices_df)[MLService.FEATURE_COLUMNS].astype(np.float32)
+        df = pd.concat([prices_df, features], axis=1)
+
+        if with_target:
+            # Targets: closes 1..horizons days ahead
+            for h in range(1, horizons + 1):
+                df[f'target_{h}'] = df['close'].shift(-h)
+            df['target'] = df['target_1']
 
-        # Volatility
-        df['volatility'] = df['close'].rolling(window=10).std()
+        df = df.dropna()
 
-        # Price changes
-        df['price_change'] = df['close'].pct_change()
-        df['price_change_5d'] = df['close'].pct_change(periods=5)
+        return df
 
-        # Volume changes
-        df['volume_change'] = df['volume'].pct_change()
+    @staticmethod
+    def fit_model(historical_data: pd.DataFrame, horizons: int = Config.FORECAST_HORIZON, symbol: str = None,
+                  params: dict = None):
+        """
+        Fit the multi-horizon RandomForest and its scaler in memory. params
+        overrides the forest's hyperparameters (default: the tuned ones, if any).
+        Returns (model, scaler, X_scaled, y), or None if there is too little data.
+        """
+        df = MLService.prepare_features(historical_data, horizons=horizons, symbol=symbol)
 
-        # RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['RSI'] = 100 - (100 / (1 + rs))
+        if len(df) < 50:
+            return None
 
-        # Target: next day's close
-        df['target'] = df['close'].shift(-1)
+        # One multi-output forest predicts every horizon from today's features
+        X = df[MLService.FEATURE_COLUMNS].values
+        y = df[[f'target_{h}' for h in range(1, horizons + 1)]].values
 
-        df = df.dropna()
+        scaler = MinMaxScaler()
+        X_scaled = scaler.fit_transform(X)
 
-        return df
+        model = RandomForestRegressor(**{
+            'n_estimators': 100,
+            'max_depth': 10,
+            'min_samples_split': 5,
+            'random_state': 42,
+            'n_jobs': -1,
+            **(params if params is not None else MLService.tuned_params('rf'))
+        })
+
+        model.fit(X_scaled, y)
+
+        return model, scaler, X_scaled, y
 
     @staticmethod
     def train_model(symbol: str, historical_data: pd.DataFrame):
@@ -59,39 +110,24 @@ class MLService:
                 print(f"Not enough data for {symbol}")
                 return None
 
-            df = MLService.prepare_features(historical_data)
-
-            if len(df) < 50:
+            fitted = MLService.fit_model(historical_data, symbol=symbol)
+            if fitted is None:
                 print(f"Not enough processed data for {symbol}")
                 return None
-
-            feature_columns = [
-                'MA5', 'MA10', 'MA20', 'MA50', 'volatility',
-                'price_change', 'price_change_5d', 'volume_change', 'RSI'
-            ]
-
-            X = df[feature_columns].values
-            y = df['target'].values
-
-            scaler = MinMaxScaler()
-            X_scaled = scaler.fit_transform(X)
-
-            model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=10,
-                min_samples_split=5,
-                random_state=42,
-                n_jobs=-1
-            )
-
-            model.fit(X_scaled, y)
+            model, scaler, X_scaled, y = fitted
 
             os.makedirs(MLService.MODELS_DIR, exist_ok=True)
-            model_path = os.path.join(MLService.MODELS_DIR, f'{symbol}_model.pkl')
-            scaler_path = os.path.join(MLService.MODELS_DIR, f'{symbol}_scaler.pkl')
+            forest_path, scaler_path = MLService._model_paths(symbol)
 
-            joblib.dump(model, model_path)
+            # Flat arrays instead of a pickled forest: workers memory-map the
+            # same file read-only instead of each holding a copy of every tree
+            FlatForest.from_estimator(model).save(forest_path)
             joblib.dump(scaler, scaler_path)
+            model_registry.put(
+                ('rf', symbol), (forest_path, scaler_path),
+                {'model': FlatForest.load(forest_path), 'scaler': scaler},
+                shared=(forest_path,)
+            )
 
             score = model.score(X_scaled, y)
             print(f"✅ RF model trained for {symbol} - Score: {score:.4f}")
@@ -106,38 +142,329 @@ class MLService:
             print(f"Error training model for {symbol}: {str(e)}")
             return None
 
+    @staticmethod
+    def forecast_path(model, scaler, df_raw: pd.DataFrame, days: int, symbol: str = None):
+        """Predicted closes for the next `days` days from the latest bar, or None"""
+        df_feat = MLService.prepare_features(df_raw, with_target=False, symbol=symbol)
+        if df_feat.empty:
+            return None
+
+        latest_features = df_feat[MLService.FEATURE_COLUMNS].iloc[-1:].values
+        latest_features_scaled = scaler.transform(latest_features)
+
+        # Direct multi-horizon model: every day from one inference
+        path = np.atleast_1d(model.predict(latest_features_scaled)[0])
+        if days > len(path):
+            # Beyond the trained horizon, hold the last forecast
+            path = np.concatenate([path, np.full(days - len(path), path[-1])])
+        return path[:days]
+
+    @staticmethod
+    def _model_paths(symbol: str):
+        return (
+            os.path.join(MLService.MODELS_DIR, f'{symbol}_forest.bin'),
+            os.path.join(MLService.MODELS_DIR, f'{symbol}_scaler.pkl'),
+        )
+
     @staticmethod
     def load_model(symbol: str):
-        """Load trained RandomForest model for a symbol"""
+        """
+        Load trained RandomForest model for a symbol (cached in the model
+        registry). None when there is none, or when it covers fewer than
+        FORECAST_HORIZON days (e.g. a legacy single-output next-day model,
+        which would forecast a flat path), so the caller retrains it.
+        """
         try:
-            model_path = os.path.join(MLService.MODELS_DIR, f'{symbol}_model.pkl')
-            scaler_path = os.path.join(MLService.MODELS_DIR, f'{symbol}_scaler.pkl')
+            forest_path, scaler_path = MLService._model_paths(symbol)
+            if os.path.exists(forest_path):
+                model_data = model_registry.get(
+                    ('rf', symbol), (forest_path, scaler_path),
+                    lambda paths: {'model': FlatForest.load(paths[0]), 'scaler': joblib.load(paths[1])},
+                    shared=(forest_path,)
+                )
+            else:
+                # Models trained before the flat format: a pickled sklearn forest
+                model_path = os.path.join(MLService.MODELS_DIR, f'{symbol}_model.pkl')
+                model_data = model_registry.get(
+                    ('rf', symbol), (model_path, scaler_path),
+                    lambda paths: {'model': flatten(joblib.load(paths[0])), 'scaler': joblib.load(paths[1])}
+                )
+
+            if model_data and getattr(model_data['model'], 'n_outputs_', 1) < Config.FORECAST_HORIZON:
+                print(f"Stale {model_data['model'].n_outputs_}-output model for {symbol}, retraining")
+                model_registry.invalidate(('rf', symbol))
+                return None
+            return model_data
 
-            if not os.path.exists(model_path) or not os.path.exists(scaler_path):
+        except Exception as e:
+            print(f"Error loading model for {symbol}: {str(e)}")
+            return None
+
+    @staticmethod
+    def tuned_params(family: str):
+        """Best hyperparameters the tuner applied for a model family, or {}"""
+        return load_tuned_params(Config.TUNED_PARAMS_PATH).get(family, {})
+
+    @staticmethod
+    def ensemble_params():
+        """EnsembleModel params from the tuned lstm/transformer/ensemble families"""
+        return ensemble_params(Config.TUNED_PARAMS_PATH)
+
+    @staticmethod
+    def ensemble_dir(symbol: str):
+        return os.path.join(MLService.MODELS_DIR, 'ensemble', symbol)
+
+    @staticmethod
+    def train_ensemble(symbol: str, historical_data: pd.DataFrame = None):
+        """
+        Train and persist the 5-model EnsembleModel for a symbol (offline:
+        nightly task / scripts). The new artifacts replace the old directory
+        in one rename and are put straight into the model registry.
+        """
+        try:
+            if historical_data is None:
+                historical_data = MLService.load_history(symbol, period=Config.ENSEMBLE_TRAIN_PERIOD)
+            if historical_data is None or len(historical_data) < 100:
+                print(f"Not enough data for {symbol}")
                 return None
 
-            model = joblib.load(model_path)
-            scaler = joblib.load(scaler_path)
+            ensemble = EnsembleModel(MLService.ensemble_params())
+            scores = ensemble.train(
+                historical_data['close'].values.astype(float),
+                n_jobs=Config.ENSEMBLE_TRAIN_CORES
+            )
+            ensemble.trained_through = historical_data.index[-1]
+            MLService._save_ensemble(symbol, ensemble)
 
-            return {'model': model, 'scaler': scaler}
+            print(f"✅ Ensemble trained for {symbol}")
+            return scores
 
         except Exception as e:
-            print(f"Error loading model for {symbol}: {str(e)}")
+            print(f"Error training ensemble for {symbol}: {str(e)}")
+            return None
+
+    @staticmethod
+    def update_ensemble(symbol: str, historical_data: pd.DataFrame = None):
+        """
+        Bring a symbol's persisted ensemble up to date with the bars that
+        arrived since it was last fitted, warm-starting its members on the
+        recent window (EnsembleModel.update). Falls back to train_ensemble
+        when there is no usable ensemble or the new bars drifted too far.
+        Returns the scores, or None on failure.
+        """
+        try:
+            if historical_data is None:
+                historical_data = MLService.load_history(symbol, period=Config.ENSEMBLE_TRAIN_PERIOD)
+            if historical_data is None or len(historical_data) < 100:
+                print(f"Not enough data for {symbol}")
+                return None
+
+            directory = MLService.ensemble_dir(symbol)
+            # A private copy: the registry's instance may be serving predictions
+            ensemble = None
+            if os.path.exists(os.path.join(directory, 'meta.pkl')):
+                ensemble = EnsembleModel().load(directory)
+            if ensemble is None or ensemble.trained_through is None:
+                return MLService.train_ensemble(symbol, historical_data)
+
+            new_bars = int((historical_data.index > ensemble.trained_through).sum())
+            if new_bars == 0:
+                print(f"Ensemble for {symbol} is up to date")
+                return ensemble.scores
+
+            scores = ensemble.update(
+                historical_data['close'].values.astype(float), new_bars,
+                window=Config.INCREMENTAL_WINDOW,
+                rounds=Config.INCREMENTAL_BOOST_ROUNDS,
+                tree_fraction=Config.INCREMENTAL_TREE_FRACTION,
+                drift_threshold=Config.INCREMENTAL_DRIFT_THRESHOLD,
+                max_updates=Config.INCREMENTAL_MAX_UPDATES
+            )
+            if scores is None:
+                return MLService.train_ensemble(symbol, historical_data)
+
+            ensemble.trained_through = historical_data.index[-1]
+            MLService._save_ensemble(symbol, ensemble)
+
+            print(f"✅ Ensemble updated for {symbol} with {new_bars} new bars")
+            return scores
+
+        except Exception as e:
+            print(f"Error updating ensemble for {symbol}: {str(e)}")
+            return None
+
+    @staticmethod
+    def _save_ensemble(symbol: str, ensemble: EnsembleModel):
+        """Replace the symbol's artifacts in one rename and put the model in the registry"""
+        directory = MLService.ensemble_dir(symbol)
+        staging = f"{directory}.{os.getpid()}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        ensemble.save(staging)
+
+        retired = f"{directory}.{os.getpid()}.old"
+        if os.path.exists(directory):
+            os.replace(directory, retired)
+        os.replace(staging, directory)
+        shutil.rmtree(retired, ignore_errors=True)
+
+        paths = [os.path.join(directory, name) for name in EnsembleModel.ARTIFACTS]
+        model_registry.put(('ensemble', symbol), paths, ensemble)
+
+    @staticmethod
+    def load_ensemble(symbol: str):
+        """Trained EnsembleModel for a symbol from the model registry, or None"""
+        try:
+            directory = MLService.ensemble_dir(symbol)
+            paths = [os.path.join(directory, name) for name in EnsembleModel.ARTIFACTS]
+            return model_registry.get(
+                ('ensemble', symbol), paths,
+                lambda _: EnsembleModel().load(directory)
+            )
+
+        except Exception as e:
+            print(f"Error loading ensemble for {symbol}: {str(e)}")
+            return None
+
+    @staticmethod
+    def panel_dir():
+        return os.path.join(MLService.MODELS_DIR, 'panel')
+
+    @staticmethod
+    def _panel_rows(symbol: str, horizons: int):
+        """(X, y) panel rows for a symbol with complete features and targets, or None"""
+        history = MLService.load_history(symbol, period=Config.PANEL_TRAIN_PERIOD)
+        if history is None or len(history) < Config.PANEL_MIN_BARS:
+            return None
+        X = feature_store.matrix(symbol, history, PANEL_COLUMNS)
+        y = panel_targets(history['close'].values, horizons)
+        keep = np.isfinite(X).all(axis=1) & np.isfinite(y).all(axis=1)
+        return X[keep], y[keep]
+
+    @staticmethod
+    def train_panel(symbols=None, horizons: int = Config.FORECAST_HORIZON, residuals: bool = True):
+        """
+        Fit the cross-sectional PanelModel on every symbol's rows (offline:
+        nightly task / scripts). Rows are stacked into one float32 memmap
+        on disk, so the training set never has to fit in memory next to the
+        per-symbol frames. Returns a summary dict, or None on failure.
+        """
+        try:
+            symbols = [s.upper() for s in (symbols or price_store.symbols())]
+            directory = MLService.panel_dir()
+            staging = f"{directory}.{os.getpid()}.tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            os.makedirs(staging)
+
+            # Pass 1 sizes the training set; features land in the feature
+            # store, so pass 2 reads them back from its maps
+            counts = {}
+            for symbol in symbols:
+                rows = MLService._panel_rows(symbol, horizons)
+                if rows is not None and len(rows[0]):
+                    counts[symbol] = len(rows[0])
+            if not counts:
+                print("Not enough data for the panel model")
+                return None
+
+            n_rows = sum(counts.values())
+            X = np.lib.format.open_memmap(os.path.join(staging, 'X.npy'), mode='w+',
+                                          dtype=np.float32, shape=(n_rows, len(PANEL_COLUMNS)))
+            y = np.lib.format.open_memmap(os.path.join(staging, 'y.npy'), mode='w+',
+                                          dtype=np.float32, shape=(n_rows, horizons))
+            codes = np.empty(n_rows, dtype=np.int32)
+            offset = 0
+            for code, symbol in enumerate(counts):
+                X_symbol, y_symbol = MLService._panel_rows(symbol, horizons)
+                n = min(len(X_symbol), counts[symbol])
+                X[offset:offset + n] = X_symbol[:n]
+                y[offset:offset + n] = y_symbol[:n]
+                codes[offset:offset + n] = code
+                offset += n
+            X.flush()
+
+            panel = PanelModel(
+                horizons,
+                max_samples=Config.PANEL_MAX_SAMPLES,
+                shrinkage=Config.PANEL_RESIDUAL_SHRINKAGE
+            )
+            oob_score = panel.fit(X[:offset], y[:offset], codes[:offset], list(counts), residuals=residuals)
+            del X, y
+            for name in ('X.npy', 'y.npy'):
+                os.remove(os.path.join(staging, name))
+            panel.save(staging)
+
+            retired = f"{directory}.{os.getpid()}.old"
+            if os.path.exists(directory):
+                os.replace(directory, retired)
+            os.replace(staging, directory)
+            shutil.rmtree(retired, ignore_errors=True)
+
+            forest_path, meta_path = (os.path.join(directory, name) for name in PanelModel.ARTIFACTS)
+            model_registry.put(('panel', None), (forest_path, meta_path),
+                               PanelModel.load(directory), shared=(forest_path,))
+
+            print(f"✅ Panel model trained on {len(counts)} symbols, {offset} rows")
+            return {'symbols': len(counts), 'rows': offset, 'oob_score': oob_score}
+
+        except Exception as e:
+            print(f"Error training panel model: {str(e)}")
             return None
 
     @staticmethod
-    def predict(symbol: str, historical_data, days: int = 7):
+    def load_panel():
+        """The trained PanelModel from the model registry, or None"""
+        try:
+            directory = MLService.panel_dir()
+            forest_path, meta_path = (os.path.join(directory, name) for name in PanelModel.ARTIFACTS)
+            return model_registry.get(
+                ('panel', None), (forest_path, meta_path),
+                lambda _: PanelModel.load(directory),
+                shared=(forest_path,)
+            )
+
+        except Exception as e:
+            print(f"Error loading panel model: {str(e)}")
+            return None
+
+    @staticmethod
+    def panel_forecast(panel: PanelModel, symbol: str, df_raw: pd.DataFrame, days: int):
+        """Predicted closes for the next `days` days from the panel model, or None"""
+        features = feature_store.matrix(symbol, df_raw, PANEL_COLUMNS)[-1]
+        if not np.isfinite(features).all():
+            return None
+
+        returns = panel.predict(features, symbol)
+        if days > len(returns):
+            # Beyond the trained horizon, hold the last forecast
+            returns = np.concatenate([returns, np.full(days - len(returns), returns[-1])])
+        return float(df_raw['close'].iloc[-1]) * (1 + returns[:days])
+
+    @staticmethod
+    def model_cache_stats():
+        return model_registry.stats()
+
+    @staticmethod
+    def feature_store_stats():
+        return feature_store.stats()
+
+    @staticmethod
+    def predict(symbol: str, historical_data=None, days: int = 7):
         """
         Predict future prices.
 
-        1) Try advanced EnsembleModel if available.
-        2) If ensemble fails, fall back to RandomForest-only logic.
-        3) Always return list of dicts:
+        1) Use the persisted EnsembleModel if one has been trained (inference only).
+        2) If ensemble fails, use the cross-sectional panel model (any symbol).
+        3) Without a panel model, fall back to RandomForest-only logic.
+        4) Always return list of dicts:
            [{date, predicted_price, confidence, direction}, ...]
         """
         try:
             # Ensure DataFrame with date index, close, volume
-            if isinstance(historical_data, pd.DataFrame):
+            if historical_data is None:
+                df_raw = MLService.load_history(symbol)
+                if df_raw is None:
+                    return None
+            elif isinstance(historical_data, pd.DataFrame):
                 df_raw = historical_data.copy()
             else:
                 df_raw = pd.DataFrame(historical_data)
@@ -153,8 +480,13 @@ class MLService:
             # ---------- 1) Try EnsembleModel ----------
             ensemble_predictions = None
             try:
-                from ml_models.ensemble import EnsembleModel
-                ensemble_array = EnsembleModel.predict(df_raw, days)
+                ensemble = MLService.load_ensemble(symbol)
+                ensemble_array = None
+                if ensemble is not None:
+                    new_bars = 0
+                    if ensemble.trained_through is not None:
+                        new_bars = int((df_raw.index > ensemble.trained_through).sum())
+                    ensemble_array = ensemble.predict(df_raw['close'].values.astype(float), days, new_bars)
                 if ensemble_array is not None and len(ensemble_array) == days:
                     ensemble_predictions = [
                         float(p) for p in ensemble_array
@@ -182,33 +514,32 @@ class MLService:
                     current_price = price
                 return predictions
 
-            # ---------- 2) Fall back to RandomForest ----------
-            model_data = MLService.load_model(symbol)
-            if not model_data:
-                model_data = MLService.train_model(symbol, df_raw)
-                if not model_data:
-                    return None
-
-            model = model_data['model']
-            scaler = model_data['scaler']
+            # ---------- 2) Fall back to the panel model ----------
+            path = None
+            if Config.PANEL_MODEL_ENABLED:
+                panel = MLService.load_panel()
+                if panel is not None:
+                    path = MLService.panel_forecast(panel, symbol, df_raw, days)
 
-            df_feat = MLService.prepare_features(df_raw)
-            if df_feat.empty:
-                return None
+            # ---------- 3) Fall back to RandomForest ----------
+            if path is None:
+                model_data = MLService.load_model(symbol)
+                if not model_data:
+                    model_data = MLService.train_model(symbol, df_raw)
+                    if not model_data:
+                        return None
 
-            feature_columns = [
-                'MA5', 'MA10', 'MA20', 'MA50', 'volatility',
-                'price_change', 'price_change_5d', 'volume_change', 'RSI'
-            ]
+                model = model_data['model']
+                scaler = model_data['scaler']
 
-            latest_features = df_feat[feature_columns].iloc[-1:].values
-            latest_features_scaled = scaler.transform(latest_features)
+                path = MLService.forecast_path(model, scaler, df_raw, days, symbol=symbol)
+                if path is None:
+                    return None
 
             predictions = []
-            current_price = float(df_feat['close'].iloc[-1])
+            current_price = last_price
 
-            for i in range(days):
-                predicted_price = float(model.predict(latest_features_scaled)[0])
+            for i, predicted_price in enumerate(path.tolist()):
                 prediction_date = datetime.now() + timedelta(days=i + 1)
 
                 direction = 'UP' if predicted_price > current_price else 'DOWN'
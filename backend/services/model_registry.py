@@ -0,0 +1,133 @@
+"""
+Model Registry - in-process LRU of loaded model artifacts
+
+Entries are keyed by name and versioned by the (mtime, size) of their files
+on disk. Files are re-stat'ed at most every MODEL_CACHE_STAT_SECONDS, so a
+hot model is served without touching the disk; a changed file is reloaded on
+the next check. The cache is bounded by entry count and by the on-disk size
+of the artifacts, which tracks their unpickled footprint closely enough to
+budget memory. Files loaded with mmap_mode='r' can be listed as shared: their
+pages belong to the OS page cache (shared by every worker) and do not count
+against the budget.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from config.config import Config
+from .quote_cache import SingleFlight
+
+
+def artifact_version(paths):
+    """((mtime_ns, size), ...) for every path, or None if any is missing"""
+    version = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        version.append((st.st_mtime_ns, st.st_size))
+    return tuple(version)
+
+
+class ModelRegistry:
+    """Thread-safe, size-bounded LRU of loaded models"""
+
+    def __init__(self, max_bytes=None, max_entries=None, stat_seconds=None):
+        self.max_bytes = max_bytes or Config.MODEL_CACHE_MAX_MB * 1024 * 1024
+        self.max_entries = max_entries or Config.MODEL_CACHE_MAX_ENTRIES
+        self.stat_seconds = Config.MODEL_CACHE_STAT_SECONDS if stat_seconds is None else stat_seconds
+        self._entries = OrderedDict()  # key -> [version, checked_at, nbytes, value]
+        self._bytes = 0
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key, paths, loader, shared=()):
+        """
+        Return the loaded artifact for `key`, calling loader(paths) when it is
+        not cached or its files changed. None when any file is missing.
+        `shared` lists paths the loader memory-maps rather than copies.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.stat_seconds:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[3]
+
+        version = artifact_version(paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    entry[1] = now
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[3]
+                self._drop(key)
+                self._stats['invalidations'] += 1
+        if version is None:
+            return None
+
+        def load():
+            # A leader may have loaded this version between our lookup and do()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[3]
+                self._stats['misses'] += 1
+            value = loader(paths)
+            if value is not None:
+                self.put(key, paths, value, version, shared)
+            return value
+
+        return self._flight.do(key, load)
+
+    def put(self, key, paths, value, version=None, shared=()):
+        """Cache an artifact that was just written or loaded"""
+        version = version or artifact_version(paths)
+        if version is None:
+            return
+        nbytes = sum(size for path, (_, size) in zip(paths, version) if path not in shared)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = [version, time.monotonic(), nbytes, value]
+            self._bytes += nbytes
+            while len(self._entries) > 1 and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                evicted, _ = next(iter(self._entries.items()))
+                self._drop(evicted)
+                self._stats['evictions'] += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                coalesced=self._flight.coalesced,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+            )
+
+
+model_registry = ModelRegistry()
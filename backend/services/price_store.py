@@ -0,0 +1,259 @@
+"""
+Price Store - local columnar OHLCV cache
+
+Each symbol is kept as one ``.npy`` file holding a (6, n) float64 block,
+one contiguous row per column (date, open, high, low, close, volume), plus
+a small JSON sidecar recording which date range has been verified upstream.
+Files are opened with ``mmap_mode='r'`` so a date-range read is a slice of
+the mapped block rather than a copy.
+
+Prices are split- and dividend-adjusted upstream, so every tail refresh
+re-fetches the newest stored bar: if its close changed, the stored history is
+on a stale adjustment basis and is dropped.
+"""
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from config.config import Config
+
+
+COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+DATE, OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(COLUMNS))
+
+# yfinance column names, in store row order (after the date row)
+FRAME_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def last_session(now=None):
+    """Date of the most recent US trading session that has closed"""
+    now = now or datetime.utcnow()
+    today = np.datetime64(now.date(), 'D')
+    if np.is_busday(today) and now.hour >= Config.SESSION_CLOSE_UTC_HOUR:
+        return now.date()
+    return np.busday_offset(today, -1, roll='forward').astype(date)
+
+
+def period_start(period, end):
+    """Translate a yfinance-style period ('6mo', '2y', 'ytd', 'max') into a start date"""
+    period = (period or '1y').lower()
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        return date(end.year, 1, 1)
+
+    units = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+    for suffix, unit in units.items():
+        if period.endswith(suffix) and period[:-len(suffix)].isdigit():
+            offset = pd.DateOffset(**{unit: int(period[:-len(suffix)])})
+            return (pd.Timestamp(end) - offset).date()
+
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def frame_to_block(frame):
+    """Convert a yfinance-shaped OHLCV DataFrame into a (6, n) store block"""
+    frame = frame.dropna(subset=['Close'])
+    index = frame.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+
+    block = np.empty((len(COLUMNS), len(frame)), dtype=np.float64)
+    block[DATE] = index.values.astype('datetime64[D]').astype(np.int64)
+    for row, column in enumerate(FRAME_COLUMNS, start=1):
+        block[row] = frame[column].to_numpy(dtype=np.float64, na_value=0.0)
+    return block
+
+
+def block_dates(block):
+    """Date row of a block as datetime64[D]"""
+    return block[DATE].astype(np.int64).astype('datetime64[D]')
+
+
+def _to_day(value):
+    return np.datetime64(value, 'D').astype(np.int64)
+
+
+class PriceStore:
+    """Memory-mapped per-symbol daily OHLCV store"""
+
+    def __init__(self, root=None):
+        self.root = root or Config.PRICE_STORE_DIR
+        self._lock = threading.Lock()
+        self._maps = {}
+
+    def _path(self, symbol, ext):
+        return os.path.join(self.root, f"{symbol.upper().replace(os.sep, '_')}.{ext}")
+
+    def has(self, symbol):
+        return os.path.exists(self._path(symbol, 'json'))
+
+    def symbols(self):
+        """Every symbol with stored bars, sorted"""
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def _load(self, symbol):
+        """Return the mapped block for a symbol, reusing the map while the file is unchanged"""
+        path = self._path(symbol, 'npy')
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        cached = self._maps.get(symbol)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        block = np.load(path, mmap_mode='r')
+        self._maps[symbol] = (mtime, block)
+        return block
+
+    def coverage(self, symbol):
+        """Verified range as {'start', 'end', 'head_complete'} or None"""
+        try:
+            with open(self._path(symbol, 'json')) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        return {
+            'start': date.fromisoformat(meta['start']),
+            'end': date.fromisoformat(meta['end']),
+            'head_complete': meta.get('head_complete', False),
+        }
+
+    def missing_ranges(self, symbol, start, end):
+        """
+        Ranges that must come from upstream to cover [start, end].
+        A start of None means "from the first listed bar". The tail range
+        starts at the newest verified bar so write() can compare it.
+        """
+        cov = self.coverage(symbol)
+        if cov is None:
+            return [(start, end)]
+
+        ranges = []
+        if not cov['head_complete'] and (start is None or start < cov['start']):
+            ranges.append((start, cov['start'] - timedelta(days=1)))
+        if end > cov['end']:
+            ranges.append((cov['end'], end))
+        return ranges
+
+    def read(self, symbol, start=None, end=None):
+        """Zero-copy (6, k) view of the stored bars within [start, end]"""
+        block = self._load(symbol)
+        if block is None:
+            return None
+
+        dates = block[DATE]
+        lo = 0 if start is None else np.searchsorted(dates, _to_day(start), side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, _to_day(end), side='right')
+        return block[:, lo:hi]
+
+    def read_frame(self, symbol, start=None, end=None):
+        """Stored bars within [start, end] as a yfinance-shaped DataFrame"""
+        block = self.read(symbol, start, end)
+        if block is None or block.shape[1] == 0:
+            return None
+
+        index = pd.DatetimeIndex(block_dates(block), name='Date')
+        data = {column: block[row] for row, column in enumerate(FRAME_COLUMNS, start=1)}
+        frame = pd.DataFrame(data, index=index)
+        frame['Volume'] = frame['Volume'].astype(np.int64)
+        return frame
+
+    def write(self, symbol, frame, start, end):
+        """
+        Merge newly fetched bars and mark [start, end] as verified, but only up
+        to the newest bar received: a session upstream has not published yet
+        stays missing, and an empty fetch does not extend coverage. Bars in
+        `frame` replace stored bars for the same date; a range that does not
+        touch the current coverage adds bars without extending it.
+
+        When a fetched bar's close differs from the stored one, upstream has
+        re-adjusted the history (split or dividend): the stored bars and
+        coverage are dropped and only `frame` is kept. Returns True then.
+        """
+        new_block = frame_to_block(frame) if frame is not None else None
+        if new_block is not None and not new_block.shape[1]:
+            new_block = None
+
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            old_block = self._load(symbol)
+            cov = self.coverage(symbol)
+
+            readjusted = self._readjusted(old_block, new_block)
+            if readjusted:
+                old_block, cov = None, None
+
+            blocks = [b for b in (new_block, old_block) if b is not None and b.shape[1]]
+            if not blocks and cov is None:
+                # Nothing stored and nothing fetched: don't cache a miss
+                return readjusted
+
+            if blocks:
+                merged = np.concatenate(blocks, axis=1)
+                # np.unique keeps the first occurrence, so new bars win, and sorts by date
+                _, keep = np.unique(merged[DATE], return_index=True)
+                merged = np.ascontiguousarray(merged[:, keep])
+
+                path = self._path(symbol, 'npy')
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, merged)
+                os.replace(tmp_path, path)
+                self._maps.pop(symbol, None)
+
+            received = block_dates(new_block)[-1].astype(date) if new_block is not None else None
+            head_complete = start is None
+            if start is None:
+                start = block_dates(merged)[0].astype(date) if blocks else cov['start']
+            if cov is not None:
+                if start > cov['end'] + timedelta(days=1) or end < cov['start'] - timedelta(days=1):
+                    # Disjoint range (e.g. a backfilled gap): keep the bars, but
+                    # coverage must stay one contiguous verified span
+                    return readjusted
+                head_complete = head_complete or cov['head_complete']
+                start = min(start, cov['start'])
+                end = max(min(end, received) if received else cov['end'], cov['end'])
+            elif received is None:
+                return readjusted
+            else:
+                end = min(end, received)
+
+            meta_path = self._path(symbol, 'json')
+            tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({
+                    'start': start.isoformat(),
+                    'end': end.isoformat(),
+                    'head_complete': head_complete,
+                }, f)
+            os.replace(tmp_path, meta_path)
+            return readjusted
+
+    @staticmethod
+    def _readjusted(old_block, new_block):
+        """True when bars present in both blocks disagree on the close"""
+        if old_block is None or new_block is None:
+            return False
+        _, new_idx, old_idx = np.intersect1d(
+            new_block[DATE], old_block[DATE], assume_unique=True, return_indices=True
+        )
+        if not len(new_idx):
+            return False
+        return not np.allclose(
+            new_block[CLOSE, new_idx], old_block[CLOSE, old_idx],
+            rtol=Config.PRICE_ADJUSTMENT_RTOL, atol=0.0
+        )
+
+price_store = PriceStore()
@@ -0,0 +1,119 @@
+"""
+Quote Cache - TTL + LRU cache with single-flight loading
+
+Concurrent misses for the same key share one loader call: the first caller
+runs it and everyone else waits on its result.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls per key; followers wait for the leader's result"""
+
+    def __init__(self):
+        self._inflight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = fn()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def inflight(self):
+        with self._lock:
+            return len(self._inflight)
+
+
+class QuoteCache:
+    """Thread-safe TTL/LRU cache that coalesces concurrent loads per key"""
+
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key, loader):
+        """
+        Return the cached value for key, calling loader() on a miss.
+        None results are returned but not cached.
+        """
+        with self._lock:
+            entry = self._fresh(key)
+        if entry is not None:
+            return entry[1]
+
+        def load():
+            # A leader may have cached the value between our lookup and do()
+            with self._lock:
+                entry = self._fresh(key)
+                if entry is None:
+                    self._stats['misses'] += 1
+            if entry is not None:
+                return entry[1]
+            value = loader()
+            if value is not None:
+                with self._lock:
+                    self._put(key, value)
+            return value
+
+        return self._flight.do(key, load)
+
+    def _fresh(self, key):
+        """Unexpired entry for key, counted as a hit, or None (caller holds the lock)"""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        self._entries.move_to_end(key)
+        self._stats['hits'] += 1
+        return entry
+
+    def _put(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                coalesced=self._flight.coalesced,
+                size=len(self._entries),
+                inflight=self._flight.inflight(),
+            )
@@ -0,0 +1,230 @@
+"""
+Symbol Index - ranked prefix search over a listing universe
+
+Built from a local listing file (CSV ``symbol,name[,...]`` or NASDAQ Trader
+style ``Symbol|Security Name|...``). Symbols live in one sorted array, so a
+prefix is a contiguous ``bisect`` range; name words are kept as a sorted
+token array with CSR postings laid out in token order, so a word prefix is
+also one contiguous slice. The index is rebuilt when the file's mtime/size
+changes and swapped in atomically.
+"""
+import bisect
+import csv
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from config.config import Config
+
+
+# Fallback universe when no listing file is present
+POPULAR_STOCKS = {
+    'AAPL': 'Apple Inc.',
+    'MSFT': 'Microsoft Corporation',
+    'GOOGL': 'Alphabet Inc.',
+    'AMZN': 'Amazon.com Inc.',
+    'TSLA': 'Tesla, Inc.',
+    'META': 'Meta Platforms Inc.',
+    'NVDA': 'NVIDIA Corporation',
+    'AMD': 'Advanced Micro Devices',
+    'NFLX': 'Netflix Inc.',
+    'DIS': 'The Walt Disney Company',
+    'JPM': 'JPMorgan Chase & Co.',
+    'BAC': 'Bank of America Corp',
+    'WMT': 'Walmart Inc.',
+    'V': 'Visa Inc.',
+    'MA': 'Mastercard Inc.'
+}
+
+# Match tiers, best first
+EXACT_SYMBOL, SYMBOL_PREFIX, NAME_WORD, NAME_PREFIX = range(4)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_PREFIX_END = '￿'
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _prefix_range(keys, prefix):
+    return bisect.bisect_left(keys, prefix), bisect.bisect_left(keys, prefix + _PREFIX_END)
+
+
+def read_listing(path):
+    """[(symbol, name), ...] from a CSV or pipe-delimited listing file"""
+    with open(path, newline='', encoding='utf-8') as f:
+        header = f.readline()
+        delimiter = '|' if '|' in header else ','
+        columns = [c.strip().lower() for c in next(csv.reader([header], delimiter=delimiter))]
+        sym_col = next((i for i, c in enumerate(columns) if c in ('symbol', 'ticker', 'act symbol')), 0)
+        name_col = next((i for i, c in enumerate(columns) if 'name' in c), 1)
+
+        rows = []
+        for row in csv.reader(f, delimiter=delimiter):
+            if len(row) <= max(sym_col, name_col):
+                continue
+            symbol = row[sym_col].strip().upper()
+            # NASDAQ Trader files end with a "File Creation Time" footer
+            if symbol and not symbol.startswith('FILE CREATION TIME'):
+                rows.append((symbol, row[name_col].strip()))
+        return rows
+
+
+class _Index:
+    """Immutable search structures for one listing snapshot"""
+
+    def __init__(self, rows):
+        names = {}
+        for symbol, name in rows:
+            names.setdefault(symbol, name or symbol)
+
+        self.symbols = sorted(names)
+        self.names = [names[s] for s in self.symbols]
+        n = len(self.symbols)
+
+        # Tie-break within a tier: popular tickers, then shorter symbols, then alphabetical
+        popular = np.array([s not in POPULAR_STOCKS for s in self.symbols], dtype=np.int64)
+        lengths = np.array([len(s) for s in self.symbols], dtype=np.int64)
+        self.rank = np.empty(n, dtype=np.int64)
+        self.rank[np.lexsort((np.arange(n), lengths, popular))] = np.arange(n)
+
+        postings = {}
+        for row, name in enumerate(self.names):
+            for token in set(tokenize(name)):
+                postings.setdefault(token, []).append(row)
+        self.tokens = sorted(postings)
+        counts = [len(postings[t]) for t in self.tokens]
+        self.offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+        self.postings = np.fromiter(
+            (row for t in self.tokens for row in postings[t]),
+            dtype=np.int64, count=int(self.offsets[-1]),
+        )
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _token_range(self, token, prefix):
+        """Slice of the token array matching `token` (or every word starting with it)"""
+        if prefix:
+            return _prefix_range(self.tokens, token)
+        lo = bisect.bisect_left(self.tokens, token)
+        return lo, lo + 1 if lo < len(self.tokens) and self.tokens[lo] == token else lo
+
+    def _name_rows(self, words, prefix):
+        """Rows whose name matches every word, as sorted unique row ids"""
+        hits = np.zeros(len(self.symbols), dtype=np.int64)
+        for word in set(words):
+            lo, hi = self._token_range(word, prefix)
+            if lo == hi:
+                return None
+            matched = np.zeros(len(self.symbols), dtype=bool)
+            # Scatter into a row mask: dedupes prefix postings without sorting them
+            matched[self.postings[self.offsets[lo]:self.offsets[hi]]] = True
+            hits += matched
+        return np.flatnonzero(hits == len(set(words)))
+
+    def _tiers(self, symbol_query, words):
+        """(tier, rows) candidates in rank order, computed lazily"""
+        lo, hi = _prefix_range(self.symbols, symbol_query)
+        if lo < hi:
+            exact = self.symbols[lo] == symbol_query
+            if exact:
+                yield EXACT_SYMBOL, np.array([lo])
+            yield SYMBOL_PREFIX, np.arange(lo + exact, hi)
+        if words:
+            yield NAME_WORD, self._name_rows(words, prefix=False)
+            yield NAME_PREFIX, self._name_rows(words, prefix=True)
+
+    def search(self, query, limit):
+        symbol_query = query.strip().upper()
+        if not symbol_query or limit <= 0:
+            return []
+
+        results, seen = [], set()
+        for tier, rows in self._tiers(symbol_query, tokenize(query)):
+            if rows is None or not len(rows):
+                continue
+            # At most len(results) of a tier's best `limit` rows were already emitted
+            ranks = self.rank[rows]
+            if len(rows) > limit:
+                top = np.argpartition(ranks, limit - 1)[:limit]
+                rows, ranks = rows[top], ranks[top]
+            for row in rows[np.argsort(ranks)].tolist():
+                if row in seen:
+                    continue
+                seen.add(row)
+                results.append({'symbol': self.symbols[row], 'name': self.names[row]})
+                if len(results) == limit:
+                    return results
+        return results
+
+
+class SymbolIndex:
+    """Process-wide search index that follows changes to the listing file"""
+
+    def __init__(self, path=None, check_seconds=None):
+        self.path = path or Config.SYMBOL_LISTING_PATH
+        self.check_seconds = Config.SYMBOL_LISTING_CHECK_SECONDS if check_seconds is None else check_seconds
+        self._index = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _file_version(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def load(self):
+        """(Re)build from the listing file, or from POPULAR_STOCKS when it is missing"""
+        with self._lock:
+            version = self._file_version()
+            rows = None
+            if version is not None:
+                try:
+                    rows = read_listing(self.path)
+                except (OSError, ValueError, csv.Error) as e:
+                    print(f"Error reading symbol listing {self.path}: {str(e)}")
+            if not rows:
+                rows = list(POPULAR_STOCKS.items())
+                if self._index is not None and self._version is not None:
+                    # Keep serving the last good listing rather than shrinking to the fallback
+                    self._checked_at = time.monotonic()
+                    return self._index
+
+            self._index = _Index(rows)
+            self._version = version
+            self._checked_at = time.monotonic()
+            return self._index
+
+    def _current(self):
+        index = self._index
+        if index is None:
+            return self.load()
+        if time.monotonic() - self._checked_at >= self.check_seconds:
+            self._checked_at = time.monotonic()
+            if self._file_version() != self._version:
+                return self.load()
+        return index
+
+    def search(self, query, limit=10):
+        """Ranked matches: exact symbol, symbol prefix, whole name word, name word prefix"""
+        return self._current().search(query, limit)
+
+    def stats(self):
+        index = self._index
+        return {
+            'path': self.path,
+            'symbols': len(index) if index is not None else 0,
+            'tokens': len(index.tokens) if index is not None else 0,
+            'from_listing': self._version is not None,
+        }
+
+
+symbol_index = SymbolIndex()
@@ -1,9 +1,25 @@
 # backend/tasks/celery_app.py
-from celery import Celery
+from celery import Celery, Task
 from celery.schedules import crontab
 
+_flask_app = None
+
+
+class FlaskTask(Task):
+    """Run each task inside a Flask app context so db.session is usable"""
+
+    def __call__(self, *args, **kwargs):
+        global _flask_app
+        if _flask_app is None:
+            from app import create_app
+            _flask_app = create_app()
+        with _flask_app.app_context():
+            return super().__call__(*args, **kwargs)
+
+
 celery_app = Celery(
     'stock_platform',
+    task_cls=FlaskTask,
     broker='redis://localhost:6379/0',
     backend='redis://localhost:6379/0',
     include=[
@@ -24,6 +40,14 @@ celery_app.conf.update(
 )
 
 celery_app.conf.beat_schedule = {
+    'nightly-ensemble-training': {
+        'task': 'tasks.ml_tasks.train_ensembles',
+        'schedule': crontab(hour=1, minute=30),  # after the data refresh
+    },
+    'nightly-panel-training': {
+        'task': 'tasks.ml_tasks.train_panel_model',
+        'schedule': crontab(hour=1, minute=45),  # after the data refresh
+    },
     'nightly-ml-predictions': {
         'task': 'tasks.ml_tasks.update_all_predictions',
         'schedule': crontab(hour=2, minute=0),  # 2 AM UTC
@@ -8,14 +8,18 @@ CORE_SYMBOLS = ['AAPL', 'MSFT', 'TSLA', 'GOOGL', 'NVDA']
 @celery_app.task
 def refresh_core_symbols():
   """
-  Scheduled task: refresh historical data for core symbols.
+  Scheduled task: incrementally refresh stored price history for core symbols.
+  Only bars after each symbol's last stored date (plus detected gaps) are fetched.
   """
   print(f"[data_tasks] Refreshing core symbols at {datetime.utcnow().isoformat()}")
 
-  for symbol in CORE_SYMBOLS:
-    try:
-      # You already use yfinance inside DataService
-      DataService.fetch_historical_data(symbol, period='6mo', store_in_db=True)
-      print(f"[data_tasks] Updated data for {symbol}")
-    except Exception as e:
-      print(f"[data_tasks] Failed for {symbol}: {str(e)[:120]}")
+  report = DataService.refresh_price_history(CORE_SYMBOLS)
+  print(
+    f"[data_tasks] {report['up_to_date']}/{report['symbols']} already current, "
+    f"{report['ranges_fetched']} ranges fetched in {report['batches']} batches, {report['gaps_backfilled']} gaps backfilled "
+    f"({report['gaps_empty']} empty, {report['gaps_known']} already checked), "
+    f"{report['inserted']} inserted, {report['updated']} updated"
+  )
+  for symbol in report['failed']:
+    print(f"[data_tasks] Failed for {symbol}")
+  return report
@@ -1,7 +1,12 @@
 # backend/tasks/ml_tasks.py
 from datetime import datetime
+
+from celery import chord
+from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy import insert
+
 from .celery_app import celery_app
-from services.data_service import DataService
+from config.config import Config
 from services.ml_service import MLService
 from config.database import db, PredictionHistory
 
@@ -10,66 +15,139 @@ WATCHLIST_SYMBOLS = ['AAPL', 'MSFT', 'TSLA', 'GOOGL', 'NVDA']
 
 
 @celery_app.task
-def update_all_predictions():
+def train_ensembles():
     """
-    Nightly task: train/refresh predictions for key symbols and store in PredictionHistory.
+    Nightly task: bring the per-symbol EnsembleModel up to date after the
+    data refresh, incrementally when INCREMENTAL_UPDATES is on (falling back
+    to a full retrain on drift), otherwise by retraining from scratch.
+    Web workers pick up the new artifacts through the model registry.
     """
-    print(f"[ml_tasks] Starting nightly prediction update at {datetime.utcnow().isoformat()}")
+    print(f"[ml_tasks] Starting ensemble training at {datetime.utcnow().isoformat()}")
 
-    updated = 0
+    train = MLService.update_ensemble if Config.INCREMENTAL_UPDATES else MLService.train_ensemble
+    trained = 0
     for symbol in WATCHLIST_SYMBOLS:
-        try:
-            df = DataService.fetch_historical_data(symbol, period='6mo')
-            preds = MLService.predict(symbol, df, days=7)
-
-            if not preds:
-                print(f"[ml_tasks] No predictions for {symbol}")
-                continue
-
-            # Expecting preds to be a single value or dict; adapt as needed
-            if isinstance(preds, dict):
-                predicted_price = preds.get('predicted_price', 0.0)
-                model_used = preds.get('model_used')
-                confidence = preds.get('confidence_score')
-                direction = preds.get('direction')
-            elif isinstance(preds, (list, tuple)) and preds:
-                first = preds[0]
-                if isinstance(first, dict):
-                    predicted_price = first.get('predicted_price', 0.0)
-                    model_used = first.get('model_used')
-                    confidence = first.get('confidence_score')
-                    direction = first.get('direction')
-                else:
-                    predicted_price = float(first)
-                    model_used = 'NightlyBatch'
-                    confidence = None
-                    direction = None
-            else:
-                predicted_price = float(preds)
-                model_used = 'NightlyBatch'
-                confidence = None
-                direction = None
-
-            # Create new history row (your model does not have `predictions` or `updated_at` columns)
-            record = PredictionHistory(
-                user_id=1,                      # default / system user
-                symbol=symbol,
-                prediction_date=datetime.utcnow(),
-                predicted_price=predicted_price,
-                actual_price=None,
-                model_used=model_used,
-                confidence_score=confidence,
-                direction=direction,
-            )
-            db.session.add(record)
+        scores = train(symbol)
+        if scores is None:
+            print(f"[ml_tasks] Ensemble training failed for {symbol}")
+            continue
+        trained += 1
+
+    print(f"[ml_tasks] Completed. Trained {trained} ensembles.")
+    return {"trained": trained}
+
+
+@celery_app.task
+def train_panel_model():
+    """
+    Nightly task: refit the cross-sectional panel model on every symbol in
+    the price store, after the data refresh.
+    """
+    print(f"[ml_tasks] Starting panel model training at {datetime.utcnow().isoformat()}")
+    summary = MLService.train_panel()
+    if summary is None:
+        print("[ml_tasks] Panel model training failed")
+        return {"trained": False}
+
+    print(f"[ml_tasks] Completed. Panel model covers {summary['symbols']} symbols.")
+    return dict(summary, trained=True)
+
+
+def _prediction_row(symbol, preds):
+    """PredictionHistory values for the first forecast step (JSON-safe; the date is added on insert)"""
+    # Expecting preds to be a single value or dict; adapt as needed
+    if isinstance(preds, dict):
+        predicted_price = preds.get('predicted_price', 0.0)
+        model_used = preds.get('model_used')
+        confidence = preds.get('confidence_score')
+        direction = preds.get('direction')
+    elif isinstance(preds, (list, tuple)) and preds:
+        first = preds[0]
+        if isinstance(first, dict):
+            predicted_price = first.get('predicted_price', 0.0)
+            model_used = first.get('model_used')
+            confidence = first.get('confidence_score')
+            direction = first.get('direction')
+        else:
+            predicted_price = float(first)
+            model_used = 'NightlyBatch'
+            confidence = None
+            direction = None
+    else:
+        predicted_price = float(preds)
+        model_used = 'NightlyBatch'
+        confidence = None
+        direction = None
+
+    # (your model does not have `predictions` or `updated_at` columns)
+    return {
+        'user_id': 1,                      # default / system user
+        'symbol': symbol,
+        'predicted_price': predicted_price,
+        'actual_price': None,
+        'model_used': model_used,
+        'confidence_score': confidence,
+        'direction': direction,
+    }
+
+
+@celery_app.task(soft_time_limit=Config.PREDICTION_SYMBOL_TIMEOUT)
+def predict_symbol(symbol):
+    """
+    Subtask of update_all_predictions: load history and predict one symbol.
+    Never raises, so one failure cannot abort the chord; returns
+    (symbol, row or None, error or None).
+    """
+    try:
+        df = MLService.load_history(symbol, period='6mo')
+        if df is None:
+            return symbol, None, 'no history'
+        preds = MLService.predict(symbol, df, days=7)
+        if not preds:
+            return symbol, None, 'no predictions'
+        return symbol, _prediction_row(symbol, preds), None
+    except SoftTimeLimitExceeded:
+        return symbol, None, 'prediction timed out'
+    except Exception as e:
+        return symbol, None, str(e)[:120]
+
+
+@celery_app.task
+def store_predictions(results):
+    """Chord callback: store every successful prediction with one bulk insert"""
+    rows, failed = [], []
+    prediction_date = datetime.utcnow()
+    for symbol, row, error in results:
+        if row is None:
+            failed.append(symbol)
+            print(f"[ml_tasks] Error on {symbol}: {error}")
+        else:
+            rows.append(dict(row, prediction_date=prediction_date))
+
+    try:
+        if rows:
+            db.session.execute(insert(PredictionHistory), rows)
             db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[ml_tasks] Bulk insert failed: {str(e)[:120]}")
+        return {"updated": 0, "failed": len(results)}
+
+    print(f"[ml_tasks] Completed. Updated {len(rows)} symbols, {len(failed)} failed.")
+    return {"updated": len(rows), "failed": len(failed)}
 
-            updated += 1
-            print(f"[ml_tasks] Updated predictions for {symbol}")
 
-        except Exception as e:
-            db.session.rollback()
-            print(f"[ml_tasks] Error on {symbol}: {str(e)[:120]}")
+@celery_app.task
+def update_all_predictions(symbols=None):
+    """
+    Nightly task: fan the key symbols out as predict_symbol subtasks, which
+    run in parallel across the Celery workers (each limited to
+    PREDICTION_SYMBOL_TIMEOUT seconds), and store the first forecast step of
+    each in PredictionHistory from the chord callback.
+    """
+    symbols = symbols or WATCHLIST_SYMBOLS
+    print(f"[ml_tasks] Starting nightly prediction update at {datetime.utcnow().isoformat()} "
+          f"({len(symbols)} symbols)")
 
-    print(f"[ml_tasks] Completed. Updated {updated} symbols.")
-    return {"updated": updated}
+    result = chord([predict_symbol.s(symbol) for symbol in symbols])(store_predictions.s())
+    return {"dispatched": len(symbols), "chord": result.id}
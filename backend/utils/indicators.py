@@ -50,9 +50,10 @@ def calculate_all_indicators(df):
     
     return indicators
 
-def get_trading_signals(df):
-    """Generate trading signals based on indicators"""
-    indicators = calculate_all_indicators(df)
+def get_trading_signals(df, indicators=None):
+    """Generate trading signals based on indicators (pass them if already calculated)"""
+    if indicators is None:
+        indicators = calculate_all_indicators(df)
     latest_idx = df.index[-1]
     
     signals = {
@@ -0,0 +1,141 @@
+"""
+Column-wise DataFrame/Series -> JSON serialization for price endpoints
+"""
+import io
+
+import numpy as np
+from flask import current_app, jsonify
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to Flask's json provider
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: only needed for format=arrow
+    pa = None
+
+
+OHLCV_FIELDS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close'}
+
+
+def column_list(values, nullable=False):
+    """ndarray/Series -> Python list in one pass; NaN becomes None when nullable"""
+    values = np.asarray(values)
+    if nullable and values.dtype.kind == 'f':
+        mask = np.isnan(values)
+        if mask.any():
+            out = values.astype(object)
+            out[mask] = None
+            return out.tolist()
+    return values.tolist()
+
+
+def index_dates(index, date_format='%Y-%m-%d'):
+    """DatetimeIndex -> date strings (local wall-clock date for tz-aware indexes)"""
+    if date_format != '%Y-%m-%d':
+        return index.strftime(date_format).tolist()
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return np.datetime_as_string(index.values, unit='D').tolist()
+
+
+def index_timestamps_ms(index):
+    """Epoch milliseconds, matching int(ts.timestamp() * 1000) for naive and tz-aware indexes"""
+    return index.as_unit('ms').asi8.tolist()
+
+
+def records(keys, columns):
+    """Zip parallel column lists into per-row dicts"""
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+def _index_columns(index, date_key, date_format, timestamp_key):
+    keys, columns = [date_key], [index_dates(index, date_format)]
+    if timestamp_key:
+        keys.append(timestamp_key)
+        columns.append(index_timestamps_ms(index))
+    return keys, columns
+
+
+def frame_records(frame, fields, date_key='date', date_format='%Y-%m-%d',
+                  timestamp_key=None, nullable=False):
+    """
+    Build [{date_key: ..., out_key: value, ...}, ...] from whole columns.
+    `fields` maps output key -> frame column.
+    """
+    keys, columns = _index_columns(frame.index, date_key, date_format, timestamp_key)
+    for key, column in fields.items():
+        keys.append(key)
+        columns.append(column_list(frame[column].to_numpy(), nullable=nullable))
+    return records(keys, columns)
+
+
+def ohlcv_records(frame, timestamp=False):
+    """yfinance-shaped OHLCV frame -> per-bar dicts (date[, timestamp], open, high, low, close, volume)"""
+    keys, columns = _index_columns(frame.index, 'date', '%Y-%m-%d', 'timestamp' if timestamp else None)
+    for key, column in OHLCV_FIELDS.items():
+        keys.append(key)
+        columns.append(frame[column].to_numpy(dtype=np.float64).tolist())
+    keys.append('volume')
+    columns.append(frame['Volume'].fillna(0).to_numpy(dtype=np.int64).tolist())
+    return records(keys, columns)
+
+
+def ohlcv_arrays(frame):
+    """OHLCV frame -> dict of typed numpy columns keyed like the JSON records"""
+    arrays = {'timestamp': frame.index.as_unit('ms').asi8}
+    for key, column in OHLCV_FIELDS.items():
+        arrays[key] = frame[column].to_numpy(dtype=np.float64)
+    arrays['volume'] = frame['Volume'].fillna(0).to_numpy(dtype=np.int64)
+    return arrays
+
+
+def ohlcv_columns(frame):
+    """
+    Columnar JSON body: {'date': [...], 'timestamp': [...], 'open': [...], ...}.
+    Numeric columns stay numpy arrays when orjson can encode them directly.
+    """
+    columns = {'date': index_dates(frame.index)}
+    for key, values in ohlcv_arrays(frame).items():
+        columns[key] = values if orjson is not None else values.tolist()
+    return columns
+
+
+def ohlcv_npz(frame):
+    """Uncompressed .npz of the OHLCV columns (int64 ms timestamps, float64 prices, int64 volume)"""
+    buffer = io.BytesIO()
+    np.savez(buffer, **ohlcv_arrays(frame))
+    return buffer.getvalue()
+
+
+def arrow_available():
+    return pa is not None
+
+
+def ohlcv_arrow(frame):
+    """Arrow IPC stream of the OHLCV columns; requires pyarrow"""
+    if pa is None:
+        raise RuntimeError('pyarrow is not installed')
+    table = pa.table(ohlcv_arrays(frame))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def series_records(series, value_key, date_format='%Y-%m-%d'):
+    """Series -> [{'date': ..., value_key: ...}, ...]"""
+    return frame_records(series.to_frame(value_key), {value_key: value_key}, date_format=date_format)
+
+
+def json_response(payload, status=200):
+    """JSON response encoded with orjson when available (numpy arrays allowed)"""
+    if orjson is None:
+        response = jsonify(payload)
+        response.status_code = status
+        return response
+
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return current_app.response_class(body, status=status, mimetype='application/json')